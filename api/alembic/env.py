@@ -4,13 +4,20 @@ from sqlalchemy import engine_from_config, pool
 
 from alembic import context
 
-from database import Base
+from database import Base, SYNC_DATABASE_URL
 import models
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
+# Migrations run against the database the app is configured with (DATABASE_URL),
+# not the placeholder URL of alembic.ini
+config.set_main_option(
+    "sqlalchemy.url",
+    SYNC_DATABASE_URL.render_as_string(hide_password=False).replace("%", "%%"),
+)
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -66,7 +73,12 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite cannot ALTER most columns in place
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,51 @@
+"""add model routing columns to digits
+
+Revision ID: 0bed68859ab2
+Revises: c3e85f1a9d20
+Create Date: 2026-10-18 10:12:45.903127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0bed68859ab2'
+down_revision: Union[str, Sequence[str], None] = 'c3e85f1a9d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = [
+    sa.Column('inference_ms', sa.Float(), nullable=True),
+    sa.Column('shadow_model_version', sa.String(length=64), nullable=True),
+    sa.Column('shadow_predicted_label', sa.Integer(), nullable=True),
+    sa.Column('shadow_confidence', sa.Float(), nullable=True),
+    sa.Column('shadow_inference_ms', sa.Float(), nullable=True),
+]
+
+
+def _existing_columns():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("digits"):
+        # The table is created with all its columns by create_db_tables
+        return {column.name for column in COLUMNS}
+    return {column["name"] for column in inspector.get_columns("digits")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = _existing_columns()
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column("digits", column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Plain ALTER TABLE rather than a batch operation, which would rebuild
+    # the SQLite table without its stats triggers
+    for column in reversed(COLUMNS):
+        op.execute(f"ALTER TABLE digits DROP COLUMN {column.name}")
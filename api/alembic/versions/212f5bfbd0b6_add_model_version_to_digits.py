@@ -0,0 +1,42 @@
+"""add model_version to digits
+
+Revision ID: 212f5bfbd0b6
+Revises: fb93d0985c6a
+Create Date: 2026-10-18 09:02:11.481907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '212f5bfbd0b6'
+down_revision: Union[str, Sequence[str], None] = 'fb93d0985c6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table_name, column_name):
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table_name):
+        # The table is created with all its columns by create_db_tables
+        return True
+    columns = inspector.get_columns(table_name)
+    return column_name in {column["name"] for column in columns}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_column("digits", "model_version"):
+        op.add_column(
+            "digits",
+            sa.Column("model_version", sa.String(length=64), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("digits") as batch_op:
+        batch_op.drop_column("model_version")
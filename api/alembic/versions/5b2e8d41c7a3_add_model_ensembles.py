@@ -0,0 +1,37 @@
+"""add model ensembles
+
+Revision ID: 5b2e8d41c7a3
+Revises: 96ff33dd86f5
+Create Date: 2026-10-18 12:14:52.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8d41c7a3'
+down_revision: Union[str, Sequence[str], None] = '96ff33dd86f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("model_ensembles"):
+        # Created by create_db_tables
+        return
+    op.create_table(
+        'model_ensembles',
+        sa.Column('version', sa.String(length=64), nullable=False),
+        sa.Column('members', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('version'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('model_ensembles')
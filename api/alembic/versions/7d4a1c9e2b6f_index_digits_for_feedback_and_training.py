@@ -0,0 +1,77 @@
+"""index digits for feedback and training scans
+
+Revision ID: 7d4a1c9e2b6f
+Revises: 212f5bfbd0b6
+Create Date: 2026-10-18 09:20:37.104512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4a1c9e2b6f'
+down_revision: Union[str, Sequence[str], None] = '212f5bfbd0b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _indexes():
+    # Same predicates as models.py, so the planner matches them with queries
+    has_feedback = sa.column("has_feedback", sa.Boolean())
+    was_used_for_training = sa.column("was_used_for_training", sa.Boolean())
+    true_label = sa.column("true_label", sa.Integer())
+    predicted_label = sa.column("predicted_label", sa.Integer())
+    training_queue = sa.and_(
+        has_feedback.is_(True),
+        was_used_for_training.is_(False),
+        true_label.is_not(None),
+    )
+    misclassified = sa.and_(has_feedback.is_(True), true_label != predicted_label)
+    return [
+        ("ix_digits_created_at", ["created_at"], None, {}),
+        (
+            "ix_digits_training_queue",
+            ["created_at"],
+            training_queue,
+            {"postgresql_include": ["uuid", "img_path", "true_label"]},
+        ),
+        (
+            "ix_digits_feedback_by_version",
+            ["model_version", "created_at", "predicted_label", "true_label"],
+            has_feedback.is_(True),
+            {},
+        ),
+        ("ix_digits_misclassified", ["created_at"], misclassified, {}),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keys stay strings whatever DIGIT_UUID_BINARY says, so the schema only
+    # depends on the revision; scripts/convert_digit_uuids.py converts them
+    inspector = sa.inspect(op.get_bind())
+    existing = {index["name"] for index in inspector.get_indexes("digits")}
+    if "ix_digits_uuid" in existing:
+        # Redundant with the primary key index
+        op.drop_index("ix_digits_uuid", table_name="digits")
+    for name, columns, where, options in _indexes():
+        if name not in existing:
+            op.create_index(
+                name,
+                "digits",
+                columns,
+                sqlite_where=where,
+                postgresql_where=where,
+                **options,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Keys converted to 16 bytes stay so: convert them back to strings first
+    for name, _, _, _ in _indexes():
+        op.drop_index(name, table_name="digits")
+    op.create_index("ix_digits_uuid", "digits", ["uuid"], unique=False)
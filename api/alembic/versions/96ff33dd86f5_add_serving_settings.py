@@ -0,0 +1,37 @@
+"""add serving settings
+
+Revision ID: 96ff33dd86f5
+Revises: 0bed68859ab2
+Create Date: 2026-10-18 11:02:27.551630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '96ff33dd86f5'
+down_revision: Union[str, Sequence[str], None] = '0bed68859ab2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("serving_settings"):
+        # Created by create_db_tables
+        return
+    op.create_table(
+        'serving_settings',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('serving_settings')
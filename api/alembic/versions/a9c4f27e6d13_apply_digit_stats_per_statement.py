@@ -0,0 +1,39 @@
+"""apply digit stats per statement
+
+Revision ID: a9c4f27e6d13
+Revises: e4a7c2d19b58
+Create Date: 2026-10-18 15:22:41.508317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from models import stats_trigger_drop_statements, stats_trigger_statements
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4f27e6d13'
+down_revision: Union[str, Sequence[str], None] = 'e4a7c2d19b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        # SQLite has no statement-level triggers and keeps its row triggers
+        return
+    # Replaces the row-level digit_stats_apply trigger
+    for statement in stats_trigger_drop_statements(bind.dialect.name):
+        bind.exec_driver_sql(statement)
+    for statement in stats_trigger_statements(bind.dialect.name):
+        bind.exec_driver_sql(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The statement-level triggers keep the same aggregates as the row-level
+    # one did, so they stay
+    pass
@@ -0,0 +1,64 @@
+"""add digit stats aggregates
+
+Revision ID: c3e85f1a9d20
+Revises: 7d4a1c9e2b6f
+Create Date: 2026-10-18 09:41:08.236190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models import (
+    stats_backfill_statements,
+    stats_trigger_drop_statements,
+    stats_trigger_statements,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e85f1a9d20'
+down_revision: Union[str, Sequence[str], None] = '7d4a1c9e2b6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table("digit_stats"):
+        # Created along with its triggers by create_db_tables
+        return
+
+    op.create_table(
+        'digit_stats',
+        sa.Column('model_version', sa.String(length=64), nullable=False),
+        sa.Column('predicted_label', sa.Integer(), nullable=False),
+        sa.Column('true_label', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('model_version', 'predicted_label', 'true_label'),
+    )
+    op.create_table(
+        'digit_stats_hourly',
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('model_version', sa.String(length=64), nullable=False),
+        sa.Column('predictions', sa.Integer(), nullable=False),
+        sa.Column('feedbacks', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket', 'model_version'),
+    )
+    # Sent as is, since ":00" reads as a bind parameter in text(). Without
+    # the evidence aggregates, which come with revision e4a7c2d19b58.
+    for statement in stats_backfill_statements(bind.dialect.name, evidence=False):
+        bind.exec_driver_sql(statement)
+    for statement in stats_trigger_statements(bind.dialect.name, evidence=False):
+        bind.exec_driver_sql(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for statement in stats_trigger_drop_statements(op.get_bind().dialect.name):
+        op.execute(statement)
+    op.drop_table('digit_stats_hourly')
+    op.drop_table('digit_stats')
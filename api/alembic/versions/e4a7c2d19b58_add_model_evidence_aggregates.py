@@ -0,0 +1,80 @@
+"""add model evidence aggregates
+
+Revision ID: e4a7c2d19b58
+Revises: 5b2e8d41c7a3
+Create Date: 2026-10-18 12:48:09.661027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models import (
+    stats_backfill_statements,
+    stats_trigger_drop_statements,
+    stats_trigger_statements,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c2d19b58'
+down_revision: Union[str, Sequence[str], None] = '5b2e8d41c7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_triggers():
+    for statement in stats_trigger_drop_statements(op.get_bind().dialect.name):
+        op.execute(statement)
+
+
+def _rebuild_stats(evidence):
+    # Sent as is, since ":00" reads as a bind parameter in text()
+    bind = op.get_bind()
+    op.execute("DELETE FROM digit_stats")
+    op.execute("DELETE FROM digit_stats_hourly")
+    for statement in stats_backfill_statements(bind.dialect.name, evidence):
+        bind.exec_driver_sql(statement)
+    for statement in stats_trigger_statements(bind.dialect.name, evidence):
+        bind.exec_driver_sql(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("digit_shadow_stats_hourly"):
+        # Created along with the triggers by create_db_tables
+        return
+
+    _drop_triggers()
+    op.add_column(
+        'digit_stats_hourly',
+        sa.Column('inference_ms_sum', sa.Float(), nullable=False, server_default='0'),
+    )
+    op.add_column(
+        'digit_stats_hourly',
+        sa.Column('inference_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'digit_shadow_stats_hourly',
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('model_version', sa.String(length=64), nullable=False),
+        sa.Column('predictions', sa.Integer(), nullable=False),
+        sa.Column('feedbacks', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('served_correct', sa.Integer(), nullable=False),
+        sa.Column('inference_ms_sum', sa.Float(), nullable=False),
+        sa.Column('inference_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket', 'model_version'),
+    )
+    _rebuild_stats(evidence=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _drop_triggers()
+    op.drop_table('digit_shadow_stats_hourly')
+    with op.batch_alter_table('digit_stats_hourly') as batch_op:
+        batch_op.drop_column('inference_count')
+        batch_op.drop_column('inference_ms_sum')
+    _rebuild_stats(evidence=False)
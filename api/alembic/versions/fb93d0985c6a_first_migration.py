@@ -20,13 +20,25 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    # Databases created by create_db_tables before migrations were run already
+    # have the table
+    if sa.inspect(op.get_bind()).has_table("digits"):
+        return
+    op.create_table(
+        "digits",
+        sa.Column("uuid", sa.String(length=36), nullable=False),
+        sa.Column("img_path", sa.String(), nullable=False),
+        sa.Column("predicted_label", sa.Integer(), nullable=False),
+        sa.Column("confidence", sa.Float(), nullable=False),
+        sa.Column("true_label", sa.Integer(), nullable=True),
+        sa.Column("has_feedback", sa.Boolean(), nullable=True),
+        sa.Column("was_used_for_training", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("uuid"),
+    )
+    op.create_index("ix_digits_uuid", "digits", ["uuid"], unique=False)
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_table("digits")
@@ -0,0 +1,14 @@
+import hmac
+
+from config import ADMIN_TOKEN
+
+
+def admin_token_matches(value):
+    """Telling whether a header value is the admin token, in constant time
+
+    Always false when no ADMIN_TOKEN is configured, so the admin routes and
+    on-demand profiling stay closed by default.
+    """
+    if not ADMIN_TOKEN or value is None:
+        return False
+    return hmac.compare_digest(value.encode(), ADMIN_TOKEN.encode())
@@ -1,5 +1,5 @@
 from dotenv import load_dotenv
-from os import getenv
+from os import getenv, cpu_count
 
 load_dotenv()
 
@@ -7,4 +7,94 @@ APP_ENV = getenv("APP_ENV", "development")
 
 DATABASE_URL = getenv("DATABASE_URL", "sqlite:///./data/app.db")
 
-LOG_LEVEL = getenv("LOG_LEVEL", "DEBUG")
+LOG_LEVEL = getenv("LOG_LEVEL", "DEBUG").upper()
+
+LOG_FORMAT = getenv("LOG_FORMAT", "json").lower()
+
+LOG_SAMPLE_RATE = float(getenv("LOG_SAMPLE_RATE", "1"))
+
+LOG_SAMPLE_RATES = getenv("LOG_SAMPLE_RATES", "/health=0,/ready=0,/metrics=0")
+
+PREDICT_MAX_BATCH_SIZE = int(getenv("PREDICT_MAX_BATCH_SIZE", "32"))
+
+PREDICT_MAX_WAIT_MS = float(getenv("PREDICT_MAX_WAIT_MS", "5"))
+
+SERVER_WORKERS = int(getenv("SERVER_WORKERS", "0"))
+
+CPU_POOL_SIZE = int(getenv("CPU_POOL_SIZE", str(cpu_count() or 1)))
+
+IO_POOL_SIZE = int(getenv("IO_POOL_SIZE", "8"))
+
+PREDICT_BATCH_MAX_IMAGES = int(getenv("PREDICT_BATCH_MAX_IMAGES", "10000"))
+
+FEEDBACK_BATCH_MAX_ITEMS = int(getenv("FEEDBACK_BATCH_MAX_ITEMS", "10000"))
+
+PERSIST_BATCH_SIZE = int(getenv("PERSIST_BATCH_SIZE", "64"))
+
+PERSIST_FLUSH_INTERVAL_MS = float(getenv("PERSIST_FLUSH_INTERVAL_MS", "200"))
+
+PERSIST_MAX_PENDING = int(getenv("PERSIST_MAX_PENDING", "1024"))
+
+PERSIST_MAX_RETRIES = int(getenv("PERSIST_MAX_RETRIES", "3"))
+
+PERSIST_DEAD_LETTER_PATH = getenv(
+    "PERSIST_DEAD_LETTER_PATH", "./data/dead_letter.jsonl"
+)
+
+IMAGE_STORE_DIR = getenv("IMAGE_STORE_DIR", "./data/images")
+
+IMAGE_STORE_PACKED = getenv("IMAGE_STORE_PACKED", "false").lower() in ("1", "true", "yes")
+
+IMAGE_STORE_SEGMENT_MB = float(getenv("IMAGE_STORE_SEGMENT_MB", "64"))
+
+DATASET_DIR = getenv("DATASET_DIR", "./data/dataset")
+
+MODELS_DIR = getenv("MODELS_DIR", "./models")
+
+ACTIVE_MODEL_VERSION = getenv("ACTIVE_MODEL_VERSION", "cnn_latest")
+
+CHALLENGER_MODEL_VERSION = getenv("CHALLENGER_MODEL_VERSION")
+
+CHALLENGER_TRAFFIC_PERCENT = float(getenv("CHALLENGER_TRAFFIC_PERCENT", "0"))
+
+SHADOW_MODEL_VERSION = getenv("SHADOW_MODEL_VERSION")
+
+SHADOW_MAX_PENDING = int(getenv("SHADOW_MAX_PENDING", "256"))
+
+ENSEMBLE_MODEL_VERSIONS = getenv("ENSEMBLE_MODEL_VERSIONS", "")
+
+ADMIN_TOKEN = getenv("ADMIN_TOKEN")
+
+SERVING_STATE_POLL_S = float(getenv("SERVING_STATE_POLL_S", "2"))
+
+INFERENCE_BACKEND = getenv("INFERENCE_BACKEND", "keras")
+
+PREDICTION_CACHE_SIZE = int(getenv("PREDICTION_CACHE_SIZE", "4096"))
+
+PREDICTION_CACHE_TTL_S = float(getenv("PREDICTION_CACHE_TTL_S", "600"))
+
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", str(IO_POOL_SIZE)))
+
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "4"))
+
+DB_MAX_CONNECTIONS = int(getenv("DB_MAX_CONNECTIONS", "80"))
+
+DB_POOL_TIMEOUT_S = float(getenv("DB_POOL_TIMEOUT_S", "10"))
+
+DB_POOL_RECYCLE_S = int(getenv("DB_POOL_RECYCLE_S", "1800"))
+
+SQLITE_SYNCHRONOUS = getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+SQLITE_BUSY_TIMEOUT_MS = int(getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+SQLITE_CACHE_SIZE_KB = int(getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+
+DIGIT_UUID_BINARY = getenv("DIGIT_UUID_BINARY", "false").lower() == "true"
+
+PROFILING_ENABLED = getenv("PROFILING_ENABLED", "false").lower() == "true"
+
+PROFILING_SAMPLE_RATE = float(getenv("PROFILING_SAMPLE_RATE", "0"))
+
+PROFILING_INTERVAL_MS = float(getenv("PROFILING_INTERVAL_MS", "5"))
+
+PROFILING_DIR = getenv("PROFILING_DIR", "./logs/profiles")
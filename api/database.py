@@ -1,12 +1,101 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_MAX_CONNECTIONS,
+    DB_POOL_TIMEOUT_S,
+    DB_POOL_RECYCLE_S,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SERVER_WORKERS,
+)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+def database_urls(url):
+    """Returning the sync and async driver URLs of a database URL
+
+    SQLite uses the stdlib driver and aiosqlite, PostgreSQL uses psycopg 3
+    for both.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite"), url.set(drivername="sqlite+aiosqlite")
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+psycopg")
+        return url, url
+    return url, url
+
+
+def pool_limits(max_connections, processes, pool_size, max_overflow):
+    """Shrinking the pool of each engine so that the sync and async engines
+    of every process stay within `max_connections` together (0 disables it)"""
+    if max_connections <= 0:
+        return pool_size, max_overflow
+    per_engine = max(1, max_connections // (2 * max(processes, 1)))
+    pool_size = min(pool_size, per_engine)
+    return pool_size, min(max_overflow, per_engine - pool_size)
+
+
+def engine_options(url):
+    """Returning the create_engine options suited to a database backend"""
+    if make_url(url).get_backend_name() == "sqlite":
+        # Waiting on a locked database is left to busy_timeout
+        return {"connect_args": {"check_same_thread": False}}
+    pool_size, max_overflow = pool_limits(
+        DB_MAX_CONNECTIONS, SERVER_WORKERS, DB_POOL_SIZE, DB_MAX_OVERFLOW
+    )
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT_S,
+        "pool_recycle": DB_POOL_RECYCLE_S,
+        "pool_pre_ping": True,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer; NORMAL sync is
+    # durable enough with WAL and avoids an fsync per commit
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def configure_engine(engine):
+    """Applying the SQLite pragmas to every new connection of an engine"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+SYNC_DATABASE_URL, ASYNC_DATABASE_URL = database_urls(DATABASE_URL)
+
+engine = configure_engine(
+    create_engine(SYNC_DATABASE_URL, **engine_options(SYNC_DATABASE_URL))
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL)
+)
+configure_engine(async_engine.sync_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay readable after commit, as lazy loads are not possible in async code
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -19,6 +108,12 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Generating async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def create_db_tables():
     """Creating tables"""
     Base.metadata.create_all(bind=engine)
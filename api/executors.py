@@ -0,0 +1,48 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from loguru import logger
+
+from config import CPU_POOL_SIZE, IO_POOL_SIZE
+
+# Thread pools rather than process pools: PIL, NumPy, TensorFlow and the
+# SQLite driver release the GIL in their hot loops, and the Keras model would
+# otherwise have to be reloaded in every child process.
+_pools = {}
+
+
+def start_pools():
+    """Starting the bounded CPU and I/O pools"""
+    _pools["cpu"] = ThreadPoolExecutor(
+        max_workers=CPU_POOL_SIZE, thread_name_prefix="cpu"
+    )
+    _pools["io"] = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="io")
+    logger.info(f"Executor pools started (cpu={CPU_POOL_SIZE}, io={IO_POOL_SIZE})")
+
+
+def stop_pools():
+    """Waiting for running jobs and shutting the pools down"""
+    for pool in _pools.values():
+        pool.shutdown(wait=True)
+    _pools.clear()
+    logger.info("Executor pools stopped")
+
+
+async def _run(kind, fn, *args, **kwargs):
+    # Falls back on the loop's default executor when the pools are not started.
+    # Jobs run in a copy of the caller's context, as with asyncio.to_thread,
+    # so a profiled request still sees the spans recorded in the pool.
+    loop = asyncio.get_running_loop()
+    job = partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_pools.get(kind), job)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Running a CPU-bound call (decode, resize, inference) off the event loop"""
+    return await _run("cpu", fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    """Running a blocking I/O call (file write, database) off the event loop"""
+    return await _run("io", fn, *args, **kwargs)
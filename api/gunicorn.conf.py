@@ -0,0 +1,55 @@
+# Production serving: gunicorn -c gunicorn.conf.py main:app
+from os import cpu_count, environ, listdir, makedirs, remove
+from os.path import join
+
+cores = cpu_count() or 1
+
+bind = environ.get("BIND", "0.0.0.0:8000")
+workers = int(environ.get("WEB_CONCURRENCY") or cores)
+# Tells the app it runs in one of several worker processes, which leaves
+# table creation to on_starting
+environ["SERVER_WORKERS"] = str(workers)
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = 60
+graceful_timeout = 30
+
+# Importing main loads neither TensorFlow nor a model (each worker activates
+# its model in the lifespan hook), so preloading only shares the imported
+# Python code copy-on-write and no TensorFlow runtime crosses the fork. With
+# INFERENCE_BACKEND=numpy the weights themselves are memory-mapped and shared.
+preload_app = True
+
+# Each worker gets its share of the cores for the BLAS, OpenMP/oneDNN and
+# TensorFlow thread pools, as well as for the CPU executor, so N workers do not
+# run N times as many threads as there are cores
+threads_per_worker = str(max(1, cores // workers))
+for name in (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+    "CPU_POOL_SIZE",
+):
+    environ.setdefault(name, threads_per_worker)
+environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+
+# Every worker writes its metrics to this directory and /metrics aggregates
+# them; it must be set, and emptied, before prometheus_client is imported
+environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+makedirs(environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+for name in listdir(environ["PROMETHEUS_MULTIPROC_DIR"]):
+    remove(join(environ["PROMETHEUS_MULTIPROC_DIR"], name))
+
+
+def on_starting(server):
+    # Tables are created once here rather than concurrently by every worker
+    from database import create_db_tables, engine
+
+    create_db_tables()
+    engine.dispose()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
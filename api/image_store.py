@@ -0,0 +1,154 @@
+from os.path import join, exists, isabs, dirname, getsize
+from os import makedirs, replace, listdir, getpid
+from contextlib import contextmanager
+from loguru import logger
+from PIL import Image
+import numpy as np
+import threading
+import hashlib
+import fcntl
+import io
+
+from config import IMAGE_STORE_DIR, IMAGE_STORE_PACKED, IMAGE_STORE_SEGMENT_MB
+
+
+class ImageStore:
+    """Content-addressed store for submitted digit images
+
+    Images are keyed by the SHA-256 of their pixels, so identical submissions
+    are stored once. Loose mode writes one PNG per image under two levels of
+    hash-prefix directories (`ab/cd/abcd....png`). Packed mode appends the PNG
+    bytes to append-only segment files and records their offsets in an index,
+    which keeps the file count low; appends are serialized across worker
+    processes with a file lock. References returned by `put` are what
+    `Digit.img_path` holds; `read` resolves them, as well as the plain file
+    paths of rows written before the store existed.
+    """
+
+    def __init__(self, root, packed=False, segment_size=64 * 1024 * 1024):
+        self.root = root
+        self.packed = packed
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_offset = 0
+        self._segment = None
+
+    @staticmethod
+    def content_hash(img_array):
+        img_array = np.ascontiguousarray(img_array, dtype=np.uint8)
+        digest = hashlib.sha256(str(img_array.shape).encode())
+        digest.update(img_array.tobytes())
+        return digest.hexdigest()
+
+    def put(self, img_array):
+        """Storing an image once and returning its reference"""
+        content_hash = self.content_hash(img_array)
+        if self.packed:
+            return self._put_packed(content_hash, img_array)
+        return self._put_loose(content_hash, img_array)
+
+    def read(self, ref):
+        """Loading the image behind a reference as a uint8 array"""
+        return np.asarray(Image.open(io.BytesIO(self.read_bytes(ref))))
+
+    def read_bytes(self, ref):
+        """Loading the PNG bytes behind a reference"""
+        if ref.startswith("segments/"):
+            segment, offset, length = ref.rsplit(":", 2)
+            with open(join(self.root, segment), "rb") as file:
+                file.seek(int(offset))
+                return file.read(int(length))
+
+        path = ref if isabs(ref) or ref.startswith(".") else join(self.root, ref)
+        with open(path, "rb") as file:
+            return file.read()
+
+    def _put_loose(self, content_hash, img_array):
+        ref = join(content_hash[:2], content_hash[2:4], f"{content_hash}.png")
+        path = join(self.root, ref)
+        if exists(path):
+            return ref
+
+        makedirs(dirname(path), exist_ok=True)
+        # Written under a temporary name so concurrent writers never expose a partial file
+        tmp_path = f"{path}.{getpid()}.{threading.get_ident()}.tmp"
+        Image.fromarray(img_array).save(tmp_path, format="PNG")
+        replace(tmp_path, path)
+        return ref
+
+    def _put_packed(self, content_hash, img_array):
+        with self._lock, self._segments_lock():
+            index = self._load_index()
+            if content_hash in index:
+                return index[content_hash]
+
+            buffer = io.BytesIO()
+            Image.fromarray(img_array).save(buffer, format="PNG")
+            data = buffer.getvalue()
+
+            segment, offset = self._current_segment(len(data))
+            with open(join(self.root, segment), "ab") as file:
+                file.write(data)
+            ref = f"{segment}:{offset}:{len(data)}"
+
+            with open(self._index_path, "a") as file:
+                file.write(f"{content_hash}\t{ref}\n")
+            index[content_hash] = ref
+            return ref
+
+    @property
+    def _index_path(self):
+        return join(self.root, "segments", "index.tsv")
+
+    @contextmanager
+    def _segments_lock(self):
+        # Exclusive lock shared by every process writing to the same store
+        makedirs(join(self.root, "segments"), exist_ok=True)
+        with open(join(self.root, "segments", ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        # Only the lines appended since the last call, possibly by other processes, are read
+        first_load = self._index is None
+        if first_load:
+            self._index = {}
+        if exists(self._index_path):
+            with open(self._index_path, "rb") as file:
+                file.seek(self._index_offset)
+                for line in file:
+                    content_hash, _, ref = line.decode().rstrip("\n").partition("\t")
+                    if ref:
+                        self._index[content_hash] = ref
+                self._index_offset = file.tell()
+        if first_load:
+            logger.info(f"Image store index loaded ({len(self._index)} packed images)")
+        return self._index
+
+    def _current_segment(self, size):
+        """Returning the segment to append to and the offset the data will land at"""
+        segments_dir = join(self.root, "segments")
+        if self._segment is None:
+            makedirs(segments_dir, exist_ok=True)
+            segments = sorted(name for name in listdir(segments_dir) if name.endswith(".seg"))
+            self._segment = segments[-1] if segments else "000001.seg"
+
+        path = join(segments_dir, self._segment)
+        offset = getsize(path) if exists(path) else 0
+        # Another process may already have rolled over to the next segments
+        while offset and offset + size > self.segment_size:
+            self._segment = f"{int(self._segment.split('.')[0]) + 1:06d}.seg"
+            path = join(segments_dir, self._segment)
+            offset = getsize(path) if exists(path) else 0
+        return f"segments/{self._segment}", offset
+
+
+image_store = ImageStore(
+    IMAGE_STORE_DIR,
+    packed=IMAGE_STORE_PACKED,
+    segment_size=int(IMAGE_STORE_SEGMENT_MB * 1024 * 1024),
+)
@@ -0,0 +1,118 @@
+from contextvars import ContextVar
+from loguru import logger
+import traceback
+import random
+import json
+import time
+
+from config import APP_ENV, LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE, LOG_SAMPLE_RATES
+
+# Fields of the request being served, written on its summary line
+_fields = ContextVar("fields", default=None)
+
+
+def parse_sample_rates(value):
+    """Parsing `/path=rate,...` into a {path: rate} dict"""
+    rates = {}
+    for entry in filter(None, (entry.strip() for entry in value.split(","))):
+        path, _, rate = entry.partition("=")
+        rates[path.strip()] = float(rate)
+    return rates
+
+
+SAMPLE_RATES = parse_sample_rates(LOG_SAMPLE_RATES)
+
+
+def annotate(**fields):
+    """Adding fields to the current request's summary line"""
+    current = _fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+def _json_format(record):
+    # One JSON object per line: the message, its level and time, and every
+    # field bound to the record
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        **record["extra"],
+    }
+    if record["exception"] is not None:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["_json"] = json.dumps(payload, default=str)
+    return "{extra[_json]}\n"
+
+
+def configure_logging():
+    """Writing logs at LOG_LEVEL to the rotated backend log, as JSON lines
+    unless LOG_FORMAT is `text`
+
+    Records are handed to a background writer (enqueue), so requests never
+    wait on the disk.
+    """
+    logger.remove()
+    logger.add(
+        f"./logs/{APP_ENV}_backend.log",
+        rotation="10 MB",
+        retention="7 days",
+        compression="zip",
+        level=LOG_LEVEL,
+        enqueue=True,
+        format=(
+            "{time:YYYY-MM-DD HH:mm:ss} | {level} | {message} | {extra}"
+            if LOG_FORMAT == "text"
+            else _json_format
+        ),
+    )
+
+
+class RequestLogMiddleware:
+    """Logging one summary line per request
+
+    The line carries the method, path, status and duration, along with the
+    fields routes add through `annotate`. Successful requests are sampled at
+    the rate configured for their path (LOG_SAMPLE_RATES, else
+    LOG_SAMPLE_RATE); errors are always logged, unless the path is muted
+    with a rate of 0, as the probes are.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        fields = {}
+        token = _fields.set(fields)
+        started_at = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _fields.reset(token)
+            self._log(scope, status, time.perf_counter() - started_at, fields)
+
+    def _log(self, scope, status, elapsed, fields):
+        path = scope["path"]
+        rate = SAMPLE_RATES.get(path, LOG_SAMPLE_RATE)
+        if rate <= 0 or (status < 400 and random.random() >= rate):
+            return
+        level = "ERROR" if status >= 500 else "WARNING" if status >= 400 else "INFO"
+        logger.bind(
+            method=scope["method"],
+            path=path,
+            status=status,
+            duration_ms=round(elapsed * 1000, 3),
+            **fields,
+        ).log(level, "{} {} {}", scope["method"], path, status)
@@ -1,45 +1,106 @@
 from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI
 from loguru import logger
 from prometheus_fastapi_instrumentator import Instrumentator
 
-from routes import router
-from config import APP_ENV
-from database import create_db_tables
+from routes import (
+    router,
+    batch_predictor,
+    shadow_predictor,
+    shadow_scorer,
+    write_behind,
+    registry,
+    apply_routing,
+    serving_state,
+)
+from config import (
+    ACTIVE_MODEL_VERSION,
+    CHALLENGER_MODEL_VERSION,
+    CHALLENGER_TRAFFIC_PERCENT,
+    SHADOW_MODEL_VERSION,
+    ENSEMBLE_MODEL_VERSIONS,
+    SERVER_WORKERS,
+)
+from database import create_db_tables, async_engine
+from executors import start_pools, stop_pools, run_cpu
+from profiling import ProfilingMiddleware
+from logging_config import RequestLogMiddleware, configure_logging
+from modules.routing import parse_routing, routing_versions
 
 app = FastAPI()
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    logger.info("Application startup: Creating database tables if they don't exist...")
+async def activate_model(version):
+    """Loading the startup model, then the models of the configured routing,
+    off the event loop, before following the settings shared by the workers"""
     try:
-        create_db_tables()
-        logger.info("Database tables checked/created successfully.")
+        await run_cpu(registry.activate, version)
     except Exception as err:
-        logger.error(f"Failed to create database tables: {err}")
-        raise
+        logger.error(f"Error loading model {version}: {err}")
+    else:
+        try:
+            routing = parse_routing(
+                CHALLENGER_MODEL_VERSION,
+                CHALLENGER_TRAFFIC_PERCENT,
+                SHADOW_MODEL_VERSION,
+                ENSEMBLE_MODEL_VERSIONS,
+            )
+            if routing_versions(routing):
+                await apply_routing(routing)
+        except Exception as err:
+            logger.error(
+                f"Error applying the model routing, serving {version} only: {err}"
+            )
+
+    # Models activated and routings set through /admin, by any worker, replace
+    # the configured ones
+    await serving_state.start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Under gunicorn the master creates the tables once, before forking
+    if not SERVER_WORKERS:
+        logger.info(
+            "Application startup: Creating database tables if they don't exist..."
+        )
+        try:
+            create_db_tables()
+            logger.info("Database tables checked/created successfully.")
+        except Exception as err:
+            logger.error(f"Failed to create database tables: {err}")
+            raise
+
+    start_pools()
+    await batch_predictor.start()
+    await shadow_predictor.start()
+    await write_behind.start()
+    # The model loads in the background: /health answers right away and /ready
+    # turns to 200 once the model is warm
+    model_loading = asyncio.create_task(activate_model(ACTIVE_MODEL_VERSION))
 
     yield
 
     logger.info("Application shutdown: Cleaning up resources...")
+    model_loading.cancel()
+    await serving_state.stop()
+    await shadow_scorer.stop()
+    await batch_predictor.stop()
+    await shadow_predictor.stop()
+    await write_behind.stop()
+    await async_engine.dispose()
+    stop_pools()
 
 
 app = FastAPI(lifespan=lifespan)
 
 app.include_router(router)
 
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestLogMiddleware)
+
 instrumentator = Instrumentator()
 instrumentator.instrument(app).expose(app)
 
-logger.remove()
-
-logger.add(
-    f"./logs/{APP_ENV}_backend.log",
-    rotation="10 MB",
-    retention="7 days",
-    compression="zip",
-    level="TRACE",
-    enqueue=True,
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
-)
+configure_logging()
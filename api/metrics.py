@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram
+import time
+
+from profiling import record_span
+
+# Counters and histograms only: under gunicorn every worker writes its own
+# samples to PROMETHEUS_MULTIPROC_DIR and /metrics sums them
+
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+STAGE_SECONDS = Histogram(
+    "digit_stage_duration_seconds",
+    "Time spent in each stage of serving a prediction or a feedback",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "digit_inference_batch_size",
+    "Images per forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096),
+)
+PREDICTION_CONFIDENCE = Histogram(
+    "digit_prediction_confidence",
+    "Confidence of the predicted digit, by model version",
+    ["model_version"],
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0),
+)
+PREDICTED_DIGITS = Counter(
+    "digit_predictions_total",
+    "Predictions served, by model version and predicted digit",
+    ["model_version", "digit"],
+)
+FEEDBACKS = Counter(
+    "digit_feedback_total",
+    "Feedbacks received, by model version and whether the prediction was right",
+    ["model_version", "result"],
+)
+
+SHADOW_SCORES = Counter(
+    "digit_shadow_scores_total",
+    "Predictions submitted to the shadow model, by whether they were scored",
+    ["model_version", "result"],
+)
+
+
+@contextmanager
+def stage_timer(stage):
+    """Timing a `with` block as one observation of a serving stage, and as a
+    span of the request when it is profiled"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        record_span(stage, elapsed)
+
+
+def record_predictions(labels, confidences, model_version):
+    """Counting served predictions and their confidences"""
+    model_version = model_version or "unknown"
+    confidence = PREDICTION_CONFIDENCE.labels(model_version=model_version)
+    for label, value in zip(labels, confidences):
+        PREDICTED_DIGITS.labels(model_version=model_version, digit=str(label)).inc()
+        confidence.observe(value)
+
+
+def record_feedback(model_version, predicted_label, true_label):
+    """Counting a feedback as a right or wrong prediction of its model version"""
+    result = "correct" if predicted_label == true_label else "incorrect"
+    FEEDBACKS.labels(model_version=model_version or "unknown", result=result).inc()
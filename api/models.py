@@ -1,18 +1,478 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, func
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Float,
+    Boolean,
+    DateTime,
+    Index,
+    LargeBinary,
+    PrimaryKeyConstraint,
+    Text,
+    TypeDecorator,
+    and_,
+    event,
+    func,
+)
+from sqlalchemy.dialects import postgresql
 import uuid as uuid_lib
 
+from config import DIGIT_UUID_BINARY
 from database import Base
 
 
+class UuidKey(TypeDecorator):
+    """A UUID exchanged as its 36-character string
+
+    Stored as that string, or, with `binary`, in 16 bytes: the native uuid
+    type on PostgreSQL and a BLOB elsewhere, which halves the primary key
+    and every index that carries it.
+    """
+
+    impl = String(36)
+    cache_ok = True
+
+    def __init__(self, binary=False):
+        super().__init__()
+        self.binary = binary
+
+    def load_dialect_impl(self, dialect):
+        if not self.binary:
+            return dialect.type_descriptor(String(36))
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not self.binary or dialect.name == "postgresql":
+            return value
+        return uuid_lib.UUID(str(value)).bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or not self.binary or dialect.name == "postgresql":
+            return value
+        return str(uuid_lib.UUID(bytes=bytes(value)))
+
+
 class Digit(Base):
     __tablename__ = "digits"
     uuid = Column(
-        String(36), primary_key=True, index=True, default=lambda: str(uuid_lib.uuid4())
+        UuidKey(binary=DIGIT_UUID_BINARY),
+        primary_key=True,
+        default=lambda: str(uuid_lib.uuid4()),
     )
     img_path = Column(String, nullable=False)
     predicted_label = Column(Integer, nullable=False)
     confidence = Column(Float, nullable=False)
+    model_version = Column(String(64))
     true_label = Column(Integer)
     has_feedback = Column(Boolean, default=False)
     was_used_for_training = Column(Boolean, default=False)
     created_at = Column(DateTime, default=func.now())
+    # Forward pass of the batch that served the digit, none on a cache hit
+    inference_ms = Column(Float)
+    # Answer of the shadow model, scored in the background
+    shadow_model_version = Column(String(64))
+    shadow_predicted_label = Column(Integer)
+    shadow_confidence = Column(Float)
+    shadow_inference_ms = Column(Float)
+
+
+# Feedback rows not yet packed into the training set. Queries must spell
+# partial-index predicates the same way for SQLite to pick the index.
+TRAINING_QUEUE = and_(
+    Digit.has_feedback.is_(True),
+    Digit.was_used_for_training.is_(False),
+    Digit.true_label.is_not(None),
+)
+
+MISCLASSIFIED = and_(
+    Digit.has_feedback.is_(True), Digit.true_label != Digit.predicted_label
+)
+
+
+def _partial(predicate):
+    return {"sqlite_where": predicate, "postgresql_where": predicate}
+
+
+# Partial indexes only hold the rows their predicate selects, so they stay
+# small and cost nothing on /predict inserts
+Index("ix_digits_created_at", Digit.created_at)
+Index(
+    "ix_digits_training_queue",
+    Digit.created_at,
+    # Index-only training scans on PostgreSQL
+    postgresql_include=["uuid", "img_path", "true_label"],
+    **_partial(TRAINING_QUEUE),
+)
+Index(
+    "ix_digits_feedback_by_version",
+    Digit.model_version,
+    Digit.created_at,
+    Digit.predicted_label,
+    Digit.true_label,
+    **_partial(Digit.has_feedback.is_(True)),
+)
+Index("ix_digits_misclassified", Digit.created_at, **_partial(MISCLASSIFIED))
+
+
+class ServingSetting(Base):
+    """A serving setting every worker applies, as a JSON value"""
+
+    __tablename__ = "serving_settings"
+    key = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class ModelEnsemble(Base):
+    """The versions whose averaged logits an ensemble version stands for"""
+
+    __tablename__ = "model_ensembles"
+    version = Column(String(64), primary_key=True)
+    # Comma-separated, like ENSEMBLE_MODEL_VERSIONS
+    members = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+
+class DigitStats(Base):
+    """Count of digits per model version, predicted and true label
+
+    `true_label` is -1 for digits without feedback. Kept up to date by
+    database triggers; its size depends on the model versions and labels,
+    not on the number of digits.
+    """
+
+    __tablename__ = "digit_stats"
+    model_version = Column(String(64), nullable=False)
+    predicted_label = Column(Integer, nullable=False)
+    true_label = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        PrimaryKeyConstraint("model_version", "predicted_label", "true_label"),
+    )
+
+
+class DigitStatsHourly(Base):
+    """Predictions, feedbacks and correct predictions per hour and model version
+
+    Digits are bucketed by the hour they were predicted, feedback included.
+    `inference_ms_sum` adds up the forward passes of the `inference_count`
+    digits that ran one, cache hits being left out.
+    """
+
+    __tablename__ = "digit_stats_hourly"
+    bucket = Column(DateTime, nullable=False)
+    model_version = Column(String(64), nullable=False)
+    predictions = Column(Integer, nullable=False, default=0)
+    feedbacks = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    inference_ms_sum = Column(Float, nullable=False, default=0)
+    inference_count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (PrimaryKeyConstraint("bucket", "model_version"),)
+
+
+class DigitShadowStatsHourly(Base):
+    """The same per hour and shadow model version, over the digits it scored
+
+    `correct` counts the shadow's right answers and `served_correct` those
+    of the models that served the same digits.
+    """
+
+    __tablename__ = "digit_shadow_stats_hourly"
+    bucket = Column(DateTime, nullable=False)
+    model_version = Column(String(64), nullable=False)
+    predictions = Column(Integer, nullable=False, default=0)
+    feedbacks = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    served_correct = Column(Integer, nullable=False, default=0)
+    inference_ms_sum = Column(Float, nullable=False, default=0)
+    inference_count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (PrimaryKeyConstraint("bucket", "model_version"),)
+
+
+def _stats_expressions(row, dialect_name):
+    # Version key, true label (-1 without feedback) and hour bucket of a digit row
+    version = f"coalesce({row}.model_version, '')"
+    label = (
+        f"CASE WHEN {row}.has_feedback AND {row}.true_label IS NOT NULL "
+        f"THEN {row}.true_label ELSE -1 END"
+    )
+    created_at = f"coalesce({row}.created_at, CURRENT_TIMESTAMP)"
+    if dialect_name == "postgresql":
+        bucket = f"date_trunc('hour', {created_at})"
+    else:
+        # Same text format as the DateTime values SQLAlchemy writes to SQLite
+        bucket = f"strftime('%Y-%m-%d %H:00:00.000000', {created_at})"
+    return version, label, bucket
+
+
+def _stats_delta(row, sign, dialect_name, evidence=True):
+    # Upserts adding (sign=1) or removing (sign=-1) one digit row from the
+    # stats; `evidence` adds the latency and shadow aggregates of /stats/models
+    version, label, bucket = _stats_expressions(row, dialect_name)
+    feedbacks = f"CASE WHEN {label} >= 0 THEN {sign} ELSE 0 END"
+    correct = f"CASE WHEN {label} = {row}.predicted_label THEN {sign} ELSE 0 END"
+    statements = [
+        f"INSERT INTO digit_stats (model_version, predicted_label, true_label, count) "
+        f"VALUES ({version}, {row}.predicted_label, {label}, {sign}) "
+        f"ON CONFLICT (model_version, predicted_label, true_label) "
+        f"DO UPDATE SET count = digit_stats.count + excluded.count",
+    ]
+    if not evidence:
+        return statements + [
+            f"INSERT INTO digit_stats_hourly "
+            f"(bucket, model_version, predictions, feedbacks, correct) "
+            f"VALUES ({bucket}, {version}, {sign}, {feedbacks}, {correct}) "
+            f"ON CONFLICT (bucket, model_version) DO UPDATE SET "
+            f"predictions = digit_stats_hourly.predictions + excluded.predictions, "
+            f"feedbacks = digit_stats_hourly.feedbacks + excluded.feedbacks, "
+            f"correct = digit_stats_hourly.correct + excluded.correct",
+        ]
+
+    def timing(column):
+        return (
+            f"coalesce({row}.{column}, 0) * {sign}, "
+            f"CASE WHEN {row}.{column} IS NOT NULL THEN {sign} ELSE 0 END"
+        )
+
+    shadow_correct = (
+        f"CASE WHEN {label} = {row}.shadow_predicted_label THEN {sign} ELSE 0 END"
+    )
+    return statements + [
+        f"INSERT INTO digit_stats_hourly (bucket, model_version, predictions, "
+        f"feedbacks, correct, inference_ms_sum, inference_count) "
+        f"VALUES ({bucket}, {version}, {sign}, {feedbacks}, {correct}, "
+        f"{timing('inference_ms')}) "
+        f"ON CONFLICT (bucket, model_version) DO UPDATE SET "
+        f"{_sum_excluded('digit_stats_hourly', HOURLY_SUMS)}",
+        # A SELECT, so digits without a shadow score add nothing
+        f"INSERT INTO digit_shadow_stats_hourly (bucket, model_version, "
+        f"predictions, feedbacks, correct, served_correct, inference_ms_sum, "
+        f"inference_count) "
+        f"SELECT {bucket}, {row}.shadow_model_version, {sign}, {feedbacks}, "
+        f"{shadow_correct}, {correct}, {timing('shadow_inference_ms')} "
+        f"WHERE {row}.shadow_model_version IS NOT NULL "
+        f"ON CONFLICT (bucket, model_version) DO UPDATE SET "
+        f"{_sum_excluded('digit_shadow_stats_hourly', SHADOW_HOURLY_SUMS)}",
+    ]
+
+
+HOURLY_SUMS = (
+    "predictions",
+    "feedbacks",
+    "correct",
+    "inference_ms_sum",
+    "inference_count",
+)
+
+SHADOW_HOURLY_SUMS = HOURLY_SUMS + ("served_correct",)
+
+
+def _sum_excluded(table, columns):
+    return ", ".join(
+        f"{column} = {table}.{column} + excluded.{column}" for column in columns
+    )
+
+
+def stats_backfill_statements(dialect_name, evidence=True):
+    """Returning the statements filling the empty stats tables from `digits`"""
+    version, label, bucket = _stats_expressions("digits", dialect_name)
+    statements = [
+        "INSERT INTO digit_stats (model_version, predicted_label, true_label, count) "
+        f"SELECT {version}, digits.predicted_label, {label}, count(*) "
+        "FROM digits GROUP BY 1, 2, 3",
+    ]
+    feedbacks = f"sum(CASE WHEN {label} >= 0 THEN 1 ELSE 0 END)"
+    correct = f"sum(CASE WHEN {label} = digits.predicted_label THEN 1 ELSE 0 END)"
+    if not evidence:
+        return statements + [
+            "INSERT INTO digit_stats_hourly "
+            "(bucket, model_version, predictions, feedbacks, correct) "
+            f"SELECT {bucket}, {version}, count(*), {feedbacks}, {correct} "
+            "FROM digits GROUP BY 1, 2",
+        ]
+    shadow_correct = (
+        f"sum(CASE WHEN {label} = digits.shadow_predicted_label THEN 1 ELSE 0 END)"
+    )
+    return statements + [
+        "INSERT INTO digit_stats_hourly (bucket, model_version, predictions, "
+        "feedbacks, correct, inference_ms_sum, inference_count) "
+        f"SELECT {bucket}, {version}, count(*), {feedbacks}, {correct}, "
+        "coalesce(sum(digits.inference_ms), 0), count(digits.inference_ms) "
+        "FROM digits GROUP BY 1, 2",
+        "INSERT INTO digit_shadow_stats_hourly (bucket, model_version, "
+        "predictions, feedbacks, correct, served_correct, inference_ms_sum, "
+        "inference_count) "
+        f"SELECT {bucket}, digits.shadow_model_version, count(*), {feedbacks}, "
+        f"{shadow_correct}, {correct}, "
+        "coalesce(sum(digits.shadow_inference_ms), 0), "
+        "count(digits.shadow_inference_ms) "
+        "FROM digits WHERE digits.shadow_model_version IS NOT NULL GROUP BY 1, 2",
+    ]
+
+
+STATS_COLUMNS = "model_version, predicted_label, true_label, has_feedback"
+
+EVIDENCE_COLUMNS = (
+    "inference_ms, shadow_model_version, shadow_predicted_label, shadow_inference_ms"
+)
+
+
+def _stats_changes(changes, evidence=True):
+    # PostgreSQL upserts applying a whole statement's worth of digit rows at
+    # once: `changes` selects them with a `sign` column, 1 for added rows and
+    # -1 for removed ones. Deltas are summed per key, so an UPDATE nets out
+    # its old and new rows, and keys that end up unchanged are not touched.
+    # Keys are upserted in sorted order, table after table, so concurrent
+    # statements lock the same rows in the same order.
+    version, label, bucket = _stats_expressions("d", "postgresql")
+    source = f"FROM ({changes}) AS d"
+
+    def upsert(table, columns, keys, sums, where=""):
+        having = " OR ".join(f"{total} <> 0" for total in sums)
+        order = ", ".join(str(i + 1) for i in range(len(keys)))
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(keys + sums)} {source} {where}"
+            f"GROUP BY {order} HAVING {having} ORDER BY {order} "
+            f"ON CONFLICT ({', '.join(columns[:len(keys)])}) DO UPDATE SET "
+            f"{_sum_excluded(table, columns[len(keys):])}"
+        )
+
+    feedbacks = f"sum(CASE WHEN {label} >= 0 THEN d.sign ELSE 0 END)"
+    correct = f"sum(CASE WHEN {label} = d.predicted_label THEN d.sign ELSE 0 END)"
+    statements = [
+        upsert(
+            "digit_stats",
+            ("model_version", "predicted_label", "true_label", "count"),
+            [version, "d.predicted_label", label],
+            ["sum(d.sign)"],
+        ),
+    ]
+    if not evidence:
+        return statements + [
+            upsert(
+                "digit_stats_hourly",
+                ("bucket", "model_version", "predictions", "feedbacks", "correct"),
+                [bucket, version],
+                ["sum(d.sign)", feedbacks, correct],
+            ),
+        ]
+
+    def timing(column):
+        return [
+            f"coalesce(sum(d.{column} * d.sign), 0)",
+            f"sum(CASE WHEN d.{column} IS NOT NULL THEN d.sign ELSE 0 END)",
+        ]
+
+    shadow_correct = (
+        f"sum(CASE WHEN {label} = d.shadow_predicted_label THEN d.sign ELSE 0 END)"
+    )
+    return statements + [
+        upsert(
+            "digit_stats_hourly",
+            ("bucket", "model_version") + HOURLY_SUMS,
+            [bucket, version],
+            ["sum(d.sign)", feedbacks, correct, *timing("inference_ms")],
+        ),
+        upsert(
+            "digit_shadow_stats_hourly",
+            ("bucket", "model_version") + SHADOW_HOURLY_SUMS,
+            [bucket, "d.shadow_model_version"],
+            [
+                "sum(d.sign)",
+                feedbacks,
+                shadow_correct,
+                *timing("shadow_inference_ms"),
+                correct,
+            ],
+            where="WHERE d.shadow_model_version IS NOT NULL ",
+        ),
+    ]
+
+
+STATS_TRIGGERS = ("digit_stats_insert", "digit_stats_delete", "digit_stats_update")
+
+
+def stats_trigger_drop_statements(dialect_name):
+    """Returning the DDL dropping the stats triggers, whichever revision made them"""
+    if dialect_name != "postgresql":
+        return [f"DROP TRIGGER IF EXISTS {name}" for name in STATS_TRIGGERS]
+    return [
+        # The row-level trigger of the first revisions
+        "DROP TRIGGER IF EXISTS digit_stats_apply ON digits",
+        "DROP FUNCTION IF EXISTS digit_stats_apply()",
+        *(f"DROP TRIGGER IF EXISTS {name} ON digits" for name in STATS_TRIGGERS),
+        *(f"DROP FUNCTION IF EXISTS {name}()" for name in STATS_TRIGGERS),
+    ]
+
+
+def stats_trigger_statements(dialect_name, evidence=True):
+    """Returning the DDL of the triggers keeping the stats tables in step with `digits`"""
+    columns = f"{STATS_COLUMNS}, {EVIDENCE_COLUMNS}" if evidence else STATS_COLUMNS
+    if dialect_name == "postgresql":
+        # Statement-level, over transition tables: a batch INSERT updates
+        # each aggregate row once rather than once per digit. Transition
+        # tables rule out an UPDATE OF column list; UPDATEs of other columns
+        # change no sum, so they upsert nothing.
+        inserted = "SELECT new_rows.*, 1 AS sign FROM new_rows"
+        deleted = "SELECT old_rows.*, -1 AS sign FROM old_rows"
+
+        def trigger(name, event, referencing, changes):
+            body = "".join(f"{sql};\n" for sql in _stats_changes(changes, evidence))
+            return [
+                f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger "
+                f"AS $$ BEGIN\n{body}RETURN NULL;\nEND $$ LANGUAGE plpgsql",
+                f"CREATE TRIGGER {name} AFTER {event} ON digits "
+                f"REFERENCING {referencing} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION {name}()",
+            ]
+
+        return [
+            *trigger("digit_stats_insert", "INSERT", "NEW TABLE AS new_rows", inserted),
+            *trigger("digit_stats_delete", "DELETE", "OLD TABLE AS old_rows", deleted),
+            *trigger(
+                "digit_stats_update",
+                "UPDATE",
+                "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+                f"{deleted} UNION ALL {inserted}",
+            ),
+        ]
+
+    def trigger(name, event, statements):
+        body = "".join(f"{sql};\n" for sql in statements)
+        return f"CREATE TRIGGER {name} AFTER {event} ON digits BEGIN\n{body}END"
+
+    return [
+        trigger(
+            "digit_stats_insert",
+            "INSERT",
+            _stats_delta("NEW", 1, dialect_name, evidence),
+        ),
+        trigger(
+            "digit_stats_delete",
+            "DELETE",
+            _stats_delta("OLD", -1, dialect_name, evidence),
+        ),
+        trigger(
+            "digit_stats_update",
+            f"UPDATE OF {columns}",
+            _stats_delta("OLD", -1, dialect_name, evidence)
+            + _stats_delta("NEW", 1, dialect_name, evidence),
+        ),
+    ]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_stats(metadata, connection, tables=(), **kw):
+    # Only when create_all has just created the stats tables, which may be
+    # added next to an existing digits table. Sent as is, since ":00" reads
+    # as a bind parameter in text().
+    if DigitStats.__table__ not in tables:
+        return
+    dialect_name = connection.dialect.name
+    for statement in stats_backfill_statements(dialect_name):
+        connection.exec_driver_sql(statement)
+    for statement in stats_trigger_statements(dialect_name):
+        connection.exec_driver_sql(statement)
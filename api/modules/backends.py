@@ -0,0 +1,109 @@
+from os.path import exists, splitext
+from loguru import logger
+import numpy as np
+import threading
+
+
+class KerasBackend:
+    """Serving the .keras model with full TensorFlow/Keras"""
+
+    name = "keras"
+
+    def load(self, path):
+        from tensorflow import keras
+
+        return keras.models.load_model(path)
+
+    def predict(self, model, X):
+        return np.asarray(model.predict_on_batch(X))
+
+
+class TFLiteModel:
+    """A TFLite interpreter resized on demand to the incoming batch size"""
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.input_index = interpreter.get_input_details()[0]["index"]
+        self.output_index = interpreter.get_output_details()[0]["index"]
+        self.batch_size = None
+        # Interpreters are not thread-safe; concurrent batches take turns
+        self.lock = threading.Lock()
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32).reshape(len(X), 28, 28, 1)
+        with self.lock:
+            if self.batch_size != len(X):
+                self.interpreter.resize_tensor_input(self.input_index, X.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = len(X)
+            self.interpreter.set_tensor(self.input_index, X)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class TFLiteBackend:
+    """Serving the `.tflite` flatbuffer exported next to each `.keras` file"""
+
+    name = "tflite"
+
+    def load(self, path):
+        tflite_path = f"{splitext(path)[0]}.tflite"
+        if not exists(tflite_path):
+            raise FileNotFoundError(
+                f"{tflite_path} not found, export it with scripts/export_model.py"
+            )
+        return TFLiteModel(_interpreter_class()(model_path=tflite_path))
+
+    def predict(self, model, X):
+        return model.predict(X)
+
+
+class NumpyBackend:
+    """Serving the .keras weights with the pure-NumPy engine, without TensorFlow
+
+    Weights are memory-mapped from a `<version>.weights.npy` file written next
+    to the model, so every worker process shares a single copy.
+    """
+
+    name = "numpy"
+
+    def load(self, path):
+        from modules.numpy_engine import load_keras, map_weights
+
+        model = load_keras(path)
+        try:
+            return map_weights(model, f"{splitext(path)[0]}.weights.npy")
+        except OSError as err:
+            logger.warning(f"Keeping the weights of {path} in process memory: {err}")
+            return model
+
+    def predict(self, model, X):
+        return model.predict(X)
+
+
+def _interpreter_class():
+    # The standalone LiteRT runtime is much lighter than TensorFlow when installed
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+
+        return Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        return tf.lite.Interpreter
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (KerasBackend(), TFLiteBackend(), NumpyBackend())
+}
+
+
+def get_backend(name):
+    """Returning the inference backend registered under a name"""
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown inference backend {name}, expected one of {sorted(BACKENDS)}"
+        )
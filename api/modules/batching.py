@@ -0,0 +1,150 @@
+from collections import Counter
+from contextlib import contextmanager
+import asyncio
+
+import numpy as np
+from loguru import logger
+
+
+class BatchPredictor:
+    """Gathering concurrent predictions into a single forward pass
+
+    Callers await `predict` with one sample; a background worker collects
+    samples until `max_batch_size` is reached or `max_wait_ms` has elapsed
+    since the first one arrived, runs `predict_fn` once on the stacked batch
+    through `run` (an awaitable executor wrapper, a plain thread by default)
+    and hands each caller back its own output row.
+
+    Samples submitted with a `key` (the model serving them) are grouped by
+    key, and each group runs as `predict_fn(X, key)`. `drain` waits for the
+    samples of some keys to be answered, before their model is unloaded.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, run=None):
+        self.predict_fn = predict_fn
+        self.run = run or asyncio.to_thread
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._queue = None
+        self._worker = None
+        # Samples taken off the queue by the worker and not answered yet
+        self._batch = []
+        # Samples submitted and not answered yet, queued or not, by key
+        self._pending = Counter()
+
+    @property
+    def running(self):
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        """Starting the background inference worker"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Batch predictor started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:g})"
+        )
+
+    async def stop(self):
+        """Stopping the worker and failing the samples still waiting, those of
+        the batch being collected or run included"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            self._batch.append(self._queue.get_nowait())
+        for _, _, future in self._batch:
+            if not future.done():
+                future.set_exception(RuntimeError("Batch predictor stopped"))
+        self._batch = []
+        logger.info("Batch predictor stopped")
+
+    async def predict(self, x, key=None):
+        """Predicting a single sample, returning its own output row"""
+        if not self.running:
+            outputs = await self.predict_batch(x[np.newaxis], key)
+            return outputs[0]
+
+        with self.holding(key):
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((x, key, future))
+            return await future
+
+    async def predict_batch(self, X, key=None):
+        """Predicting a whole batch in one pass, without going through the queue"""
+        args = (X,) if key is None else (X, key)
+        with self.holding(key):
+            return await self.run(self.predict_fn, *args)
+
+    @contextmanager
+    def holding(self, key):
+        """Counting a prediction for `key` as pending for the block's duration,
+        for predictions run outside of the batcher"""
+        self._pending[key] += 1
+        try:
+            yield
+        finally:
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+
+    async def drain(self, uses):
+        """Waiting until no prediction is pending for a key `uses(key)` accepts"""
+        # Tasks already created get to submit their samples first
+        await asyncio.sleep(0)
+        while any(uses(key) for key in list(self._pending)):
+            await asyncio.sleep(max(self.max_wait, 0.001))
+
+    async def _collect(self):
+        """Waiting for a first sample, then filling the batch until it is full or the window closes"""
+        batch = self._batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            groups = {}
+            for x, key, future in batch:
+                if not future.cancelled():
+                    groups.setdefault(key, []).append((x, future))
+            for key, group in groups.items():
+                await self._run_group(key, group)
+            self._batch = []
+
+    async def _run_group(self, key, group):
+        try:
+            X = np.stack([x for x, _ in group])
+            outputs = await self.predict_batch(X, key)
+        except Exception as err:
+            logger.error(f"Batched prediction failed for {len(group)} samples: {err}")
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        for (_, future), output in zip(group, outputs):
+            if not future.done():
+                future.set_result(output)
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from prometheus_client import Counter, Gauge
+import hashlib
+import time
+
+CACHE_REQUESTS = Counter(
+    "prediction_cache_requests_total",
+    "Prediction cache lookups, by result",
+    ["result"],
+)
+CACHE_EVICTIONS = Counter(
+    "prediction_cache_evictions_total",
+    "Prediction cache entries dropped because the cache was full",
+)
+CACHE_ENTRIES = Gauge(
+    "prediction_cache_entries",
+    "Predictions currently cached",
+    multiprocess_mode="livesum",
+)
+
+
+def image_digest(img_array):
+    """Hashing a decoded uint8 image, shape included"""
+    digest = hashlib.blake2b(str(img_array.shape).encode(), digest_size=16)
+    digest.update(img_array.tobytes())
+    return digest.digest()
+
+
+class PredictionCache:
+    """LRU cache of model outputs keyed by image digest, with a time-to-live
+
+    Entries belong to the model version that produced them: looking up or
+    storing a result for another version empties the cache, so activating or
+    rolling back a model never serves stale predictions. `max_entries=0`
+    disables caching.
+    """
+
+    def __init__(self, max_entries=4096, ttl_seconds=600.0, clock=time.monotonic):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.clock = clock
+        self.model_version = None
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, digest, model_version):
+        """Returning the cached output for an image, or None"""
+        if not self.max_entries:
+            return None
+        self._check_version(model_version)
+
+        entry = self._entries.get(digest)
+        if entry is not None and entry[0] <= self.clock():
+            del self._entries[digest]
+            entry = None
+        if entry is None:
+            CACHE_REQUESTS.labels("miss").inc()
+            CACHE_ENTRIES.set(len(self._entries))
+            return None
+
+        self._entries.move_to_end(digest)
+        CACHE_REQUESTS.labels("hit").inc()
+        return entry[1]
+
+    def put(self, digest, model_version, output):
+        """Storing an output, evicting the least recently used entries past the bound"""
+        if not self.max_entries:
+            return
+        self._check_version(model_version)
+
+        self._entries[digest] = (self.clock() + self.ttl, output)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            CACHE_EVICTIONS.inc()
+        CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        CACHE_ENTRIES.set(0)
+
+    def _check_version(self, model_version):
+        if model_version != self.model_version:
+            self.clear()
+            self.model_version = model_version
@@ -0,0 +1,143 @@
+from os.path import join, exists
+from os import makedirs
+from loguru import logger
+import numpy as np
+import struct
+
+from models import Digit, TRAINING_QUEUE
+from modules.preprocessing import EXPECTED_DIMENSION
+
+# Fixed-size .npy headers, so the shape can be rewritten in place as rows are appended
+HEADER_SIZE = 128
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def _write_header(file, shape):
+    header = "{'descr': '|u1', 'fortran_order': False, 'shape': %r, }" % (shape,)
+    header = header.ljust(HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + "\n"
+    file.seek(0)
+    file.write(NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+
+class DigitDataset:
+    """Append-only uint8 digit dataset stored as two memory-mappable .npy files
+
+    `images.npy` holds (N, 28, 28) pixels and `labels.npy` the N true labels.
+    Both are regular .npy files that `np.load(..., mmap_mode="r")` can open;
+    their headers are padded to a fixed size so appending only rewrites the
+    shape in place instead of copying the data.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.images_path = join(root, "images.npy")
+        self.labels_path = join(root, "labels.npy")
+
+    def __len__(self):
+        if not exists(self.images_path) or not exists(self.labels_path):
+            return 0
+        return min(_read_length(self.images_path), _read_length(self.labels_path))
+
+    def load(self):
+        """Memory-mapping the images and labels, without reading them into RAM"""
+        count = len(self)
+        if count == 0:
+            return (
+                np.empty((0, EXPECTED_DIMENSION, EXPECTED_DIMENSION), dtype=np.uint8),
+                np.empty((0,), dtype=np.uint8),
+            )
+        images = np.load(self.images_path, mmap_mode="r")[:count]
+        labels = np.load(self.labels_path, mmap_mode="r")[:count]
+        return images, labels
+
+    def append(self, images, labels):
+        """Appending images and labels, returning the (start, end) range they landed at"""
+        images = np.ascontiguousarray(images, dtype=np.uint8)
+        labels = np.ascontiguousarray(labels, dtype=np.uint8)
+        if len(images) != len(labels):
+            raise ValueError("Images and labels must have the same length")
+        if len(images) == 0:
+            return len(self), len(self)
+        if images.shape[1:] != (EXPECTED_DIMENSION, EXPECTED_DIMENSION):
+            raise ValueError(f"Expected (N, 28, 28) images, got {images.shape}")
+
+        makedirs(self.root, exist_ok=True)
+        start = len(self)
+        end = start + len(images)
+        # Data goes in before the header, so an interrupted append is simply ignored
+        _append(
+            self.images_path,
+            images,
+            start,
+            (end, EXPECTED_DIMENSION, EXPECTED_DIMENSION),
+        )
+        _append(self.labels_path, labels, start, (end,))
+        return start, end
+
+
+def _read_length(path):
+    with open(path, "rb") as file:
+        np.lib.format.read_magic(file)
+        shape, _, _ = np.lib.format.read_array_header_1_0(file)
+    return shape[0]
+
+
+def _append(path, array, start, shape):
+    # Rows past `start`, left by an interrupted append, are overwritten
+    row_size = int(np.prod(shape[1:], dtype=np.int64)) * array.dtype.itemsize
+    mode = "r+b" if exists(path) else "w+b"
+    with open(path, mode) as file:
+        if mode == "w+b":
+            _write_header(file, (0,) + shape[1:])
+        file.truncate(HEADER_SIZE + start * row_size)
+        file.seek(0, 2)
+        file.write(array.tobytes())
+        file.flush()
+        _write_header(file, shape)
+
+
+def append_feedback_digits(db, dataset, read_image, chunk_size=500):
+    """Packing feedback rows not used for training yet into the dataset
+
+    Rows are appended chunk by chunk and marked `was_used_for_training` once
+    their chunk is on disk. Returns the (start, end) range of the new rows.
+    """
+    rows = (
+        db.query(Digit.uuid, Digit.img_path, Digit.true_label)
+        .filter(TRAINING_QUEUE)
+        .order_by(Digit.created_at)
+        .all()
+    )
+
+    start = end = len(dataset)
+    for offset in range(0, len(rows), chunk_size):
+        chunk = rows[offset : offset + chunk_size]
+        uuids, images, labels = [], [], []
+        for uuid, img_path, true_label in chunk:
+            try:
+                image = read_image(img_path)
+            except Exception as err:
+                logger.warning(
+                    f"Skipping digit {uuid}, image {img_path} unreadable: {err}"
+                )
+                continue
+            if image.shape != (EXPECTED_DIMENSION, EXPECTED_DIMENSION):
+                logger.warning(f"Skipping digit {uuid}, unexpected shape {image.shape}")
+                continue
+            uuids.append(uuid)
+            images.append(image)
+            labels.append(true_label)
+
+        if not uuids:
+            continue
+
+        _, end = dataset.append(np.stack(images), np.array(labels))
+        db.query(Digit).filter(Digit.uuid.in_(uuids)).update(
+            {Digit.was_used_for_training: True}, synchronize_session=False
+        )
+        db.commit()
+        logger.info(
+            f"Packed {len(uuids)} feedback digits into the dataset ({end} rows)"
+        )
+
+    return start, end
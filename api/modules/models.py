@@ -1,3 +1,4 @@
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Input, Conv2D, MaxPooling2D, Flatten
@@ -25,10 +26,42 @@ def create_cnn_model():
     return model
 
 
+class MemmapBatches(tf.keras.utils.PyDataset):
+    """Streaming shuffled, normalized batches out of memory-mapped uint8 arrays
+
+    Only the rows of the current batch are read from disk, so datasets much
+    larger than RAM can be trained on.
+    """
+
+    def __init__(self, images, labels, batch_size=32, shuffle=True, **kwargs):
+        super().__init__(**kwargs)
+        self.images = images
+        self.labels = labels
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.order = np.arange(len(images))
+        self.on_epoch_end()
+
+    def __len__(self):
+        return int(np.ceil(len(self.images) / self.batch_size))
+
+    def __getitem__(self, index):
+        rows = np.sort(
+            self.order[index * self.batch_size : (index + 1) * self.batch_size]
+        )
+        X = np.asarray(self.images[rows], dtype=np.float32) / np.float32(255.0)
+        y = np.asarray(self.labels[rows], dtype=np.int64)
+        return X, y
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.order)
+
+
 def train(
     model,
     X,
-    y,
+    y=None,
     X_val=None,
     y_val=None,
     epochs=20,
@@ -36,6 +69,18 @@ def train(
     validation_split=0.2,
     verbose=0,
 ):
+    if isinstance(X, tf.keras.utils.PyDataset):
+        # Streaming datasets carry their own labels and batching
+        hist = model.fit(
+            X,
+            validation_data=(X_val, y_val)
+            if X_val is not None and y_val is not None
+            else None,
+            epochs=epochs,
+            verbose=verbose,
+        )
+        return model, hist
+
     hist = model.fit(
         X,
         y,
@@ -50,6 +95,24 @@ def train(
     return model, hist
 
 
+def finetune(model, X, y, learning_rate=1e-4, epochs=3, batch_size=32, verbose=0):
+    """Continuing the training of an already trained model with a small learning rate"""
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+        metrics=["accuracy"],
+    )
+    return train(
+        model,
+        X,
+        y,
+        epochs=epochs,
+        batch_size=batch_size,
+        validation_split=0.0,
+        verbose=verbose,
+    )
+
+
 def predict(model, X):
     y_pred = model.predict(X).flatten()
     return y_pred
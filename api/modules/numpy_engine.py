@@ -0,0 +1,168 @@
+from numpy.lib.stride_tricks import sliding_window_view
+from os import replace, getpid
+import numpy as np
+import zipfile
+import json
+import h5py
+import io
+
+WEIGHT_PATHS = {"Conv2D": "conv2d", "Dense": "dense"}
+
+ACTIVATIONS = {
+    "linear": lambda X: X,
+    "relu": lambda X: np.maximum(X, 0, out=X),
+    "softmax": lambda X: _softmax(X),
+}
+
+
+def _softmax(X):
+    X = np.exp(X - X.max(axis=-1, keepdims=True))
+    return X / X.sum(axis=-1, keepdims=True)
+
+
+def _conv2d(X, kernel, bias, strides):
+    # im2col: one (N*H'*W', kh*kw*C) patch matrix, then a single matmul
+    kh, kw, channels, filters = kernel.shape
+    windows = sliding_window_view(X, (kh, kw), axis=(1, 2))
+    windows = windows[:, :: strides[0], :: strides[1]]
+    n, height, width = windows.shape[:3]
+    patches = windows.transpose(0, 1, 2, 4, 5, 3).reshape(-1, kh * kw * channels)
+    output = patches @ kernel.reshape(kh * kw * channels, filters)
+    output += bias
+    return output.reshape(n, height, width, filters)
+
+
+def _max_pooling2d(X, pool_size, strides):
+    # Elementwise maxima of the strided window offsets, no window copies
+    ph, pw = pool_size
+    sh, sw = strides
+    height = (X.shape[1] - ph) // sh + 1
+    width = (X.shape[2] - pw) // sw + 1
+    output = None
+    for i in range(ph):
+        for j in range(pw):
+            offset = X[:, i : i + sh * height : sh, j : j + sw * width : sw]
+            output = (
+                offset.copy()
+                if output is None
+                else np.maximum(output, offset, out=output)
+            )
+    return output
+
+
+class NumpyModel:
+    """Forward pass of a Keras Sequential CNN written with vectorized NumPy
+
+    Supports the layers `create_cnn_model` is made of: Conv2D and
+    MaxPooling2D with "valid" padding, Flatten and Dense, with linear, relu
+    or softmax activations. Weights are float32 arrays, so a loaded model
+    holds no TensorFlow object at all.
+    """
+
+    def __init__(self, layers, input_shape):
+        self.layers = layers
+        self.input_shape = tuple(input_shape)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == len(self.input_shape):
+            X = X.reshape(len(X), *self.input_shape)
+
+        for kind, params in self.layers:
+            if kind == "Conv2D":
+                X = _conv2d(X, params["kernel"], params["bias"], params["strides"])
+            elif kind == "MaxPooling2D":
+                X = _max_pooling2d(X, params["pool_size"], params["strides"])
+            elif kind == "Flatten":
+                X = X.reshape(len(X), -1)
+            elif kind == "Dense":
+                X = X @ params["kernel"]
+                X += params["bias"]
+            if "activation" in params:
+                X = ACTIVATIONS[params["activation"]](X)
+        return X
+
+
+def load_keras(path):
+    """Reading a Sequential model's architecture and weights from a .keras file"""
+    with zipfile.ZipFile(path) as archive:
+        config = json.loads(archive.read("config.json"))
+        weights_file = h5py.File(io.BytesIO(archive.read("model.weights.h5")), "r")
+
+    with weights_file:
+        layers, input_shape = [], None
+        # Weights are stored under the class name numbered within the model
+        # ("conv2d", "conv2d_1", ...), whatever the layers are called
+        seen = {}
+        for layer in config["config"]["layers"]:
+            kind, layer_config = layer["class_name"], layer["config"]
+            if kind == "InputLayer":
+                input_shape = layer_config["batch_shape"][1:]
+                continue
+
+            params = {}
+            if kind in ("Conv2D", "Dense"):
+                key = WEIGHT_PATHS[kind]
+                count = seen.get(key, 0)
+                seen[key] = count + 1
+                weights = weights_file["layers"][f"{key}_{count}" if count else key]
+                weights = weights["vars"]
+                params["kernel"] = np.asarray(weights["0"], dtype=np.float32)
+                params["bias"] = np.asarray(weights["1"], dtype=np.float32)
+                params["activation"] = layer_config["activation"]
+            if kind in ("Conv2D", "MaxPooling2D"):
+                if layer_config["padding"] != "valid":
+                    raise NotImplementedError(
+                        f"{kind} padding {layer_config['padding']}"
+                    )
+                params["strides"] = tuple(layer_config["strides"])
+            if kind == "Conv2D" and tuple(layer_config["dilation_rate"]) != (1, 1):
+                raise NotImplementedError("Dilated convolutions")
+            if kind == "MaxPooling2D":
+                params["pool_size"] = tuple(layer_config["pool_size"])
+            if kind not in ("Conv2D", "MaxPooling2D", "Flatten", "Dense"):
+                raise NotImplementedError(f"Unsupported layer {kind}")
+            if params.get("activation", "linear") not in ACTIVATIONS:
+                raise NotImplementedError(
+                    f"Unsupported activation {params['activation']}"
+                )
+            layers.append((kind, params))
+
+    return NumpyModel(layers, input_shape)
+
+
+def map_weights(model, path):
+    """Backing a model's weights with a read-only memory-mapped .npy file
+
+    Worker processes mapping the same file share its pages through the OS page
+    cache instead of each holding a copy. The file is rewritten, atomically,
+    when it is missing or does not hold the model's current weights.
+    """
+    params = [
+        (layer_params, name)
+        for _, layer_params in model.layers
+        for name in ("kernel", "bias")
+        if name in layer_params
+    ]
+    flat = np.concatenate(
+        [layer_params[name].ravel() for layer_params, name in params]
+    ).astype(np.float32)
+
+    try:
+        mapped = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        mapped = None
+    if mapped is None or not np.array_equal(mapped, flat):
+        tmp_path = f"{path}.{getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, flat)
+        replace(tmp_path, path)
+        mapped = np.load(path, mmap_mode="r")
+
+    offset = 0
+    for layer_params, name in params:
+        shape = layer_params[name].shape
+        size = int(np.prod(shape))
+        layer_params[name] = mapped[offset : offset + size].reshape(shape)
+        offset += size
+    return model
@@ -0,0 +1,179 @@
+from PIL import Image
+import numpy as np
+import base64
+import io
+
+from metrics import stage_timer
+
+EXPECTED_DIMENSION = 28
+
+# MNIST digits are fitted in a 20x20 box, then centered by center of mass
+DIGIT_BOX = 20
+
+# Share of full intensity above which a pixel counts as ink
+INK_THRESHOLD = 0.1
+
+# Images prepared at once, keeping the float32 intermediates cache-sized
+PREPARE_CHUNK_SIZE = 32
+
+
+def decode_image(image_base64):
+    """Decoding a base64 image into a centered 28x28 uint8 MNIST-style digit"""
+    with stage_timer("decode"):
+        X = _open_image(image_base64)[np.newaxis]
+    with stage_timer("preprocess"):
+        return prepare_digits(X)[0]
+
+
+def normalize(X):
+    """Scaling a uint8 batch to the float32 [0, 1] model input"""
+    return np.asarray(X, dtype=np.float32) / np.float32(255.0)
+
+
+def decode_raw(data, channels=1):
+    """Decoding a raw uint8 buffer of a square image (28x28 or canvas size,
+    grayscale, RGB or RGBA) into a centered 28x28 uint8 digit without PIL"""
+    with stage_timer("decode"):
+        if channels not in (1, 3, 4):
+            raise ValueError(f"Expected 1, 3 or 4 image channels, got {channels}")
+        X = np.frombuffer(data, dtype=np.uint8)
+        side = int(round((X.size / channels) ** 0.5))
+        if not side or side * side * channels != X.size:
+            raise ValueError(
+                f"Expected a square {channels}-channel uint8 buffer, got {X.size} bytes"
+            )
+    with stage_timer("preprocess"):
+        return prepare_digits(X.reshape(1, side, side, channels))[0]
+
+
+def decode_images(images_base64):
+    """Decoding a list of base64 images into a (N, 28, 28) uint8 batch,
+    preparing same-sized images together"""
+    X = np.empty((len(images_base64), EXPECTED_DIMENSION, EXPECTED_DIMENSION), np.uint8)
+    groups = {}
+    with stage_timer("decode"):
+        for index, image_base64 in enumerate(images_base64):
+            image = _open_image(image_base64)
+            groups.setdefault(image.shape, []).append((index, image))
+    with stage_timer("preprocess"):
+        for group in groups.values():
+            indices, images = zip(*group)
+            X[list(indices)] = prepare_digits(np.stack(images))
+    return X
+
+
+def load_npy(data):
+    """Loading an uploaded .npy array into a (N, 28, 28) uint8 batch"""
+    with stage_timer("decode"):
+        X = np.load(io.BytesIO(data), allow_pickle=False)
+        if X.ndim == 2:
+            X = X[np.newaxis]
+        if X.ndim not in (3, 4):
+            raise ValueError(
+                f"Expected (N, H, W) or (N, H, W, C) images, got {X.shape}"
+            )
+        if np.issubdtype(X.dtype, np.floating) and X.size and X.max() <= 1.0:
+            X = X * 255.0
+    with stage_timer("preprocess"):
+        return prepare_digits(X)
+
+
+def _open_image(image_base64):
+    # Luminance and alpha, converted by PIL in C, rather than four channels
+    img_pil = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+    return np.asarray(img_pil.convert("LA"), dtype=np.uint8)
+
+
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def to_grayscale(X):
+    """Converting a (N, H, W, C) gray, gray+alpha, RGB or RGBA batch to
+    float32 luminance
+
+    Alpha is composited over a background contrasting with the ink: white
+    under dark strokes, black under light ones, judged per image from the
+    alpha-weighted luminance. Opaque images are left as they are.
+    """
+    channels = X.shape[-1]
+    if channels == 1:
+        return X[..., 0].astype(np.float32)
+    # Flattened to (N, pixels, channels), so the weighting is a single matmul
+    pixels = X.reshape(len(X), -1, channels).astype(np.float32)
+    if channels in (1, 2):
+        gray = pixels[..., 0]
+    else:
+        gray = pixels[..., :3] @ LUMA_WEIGHTS
+    if channels in (2, 4) and X[..., -1].min() < 255:
+        alpha = pixels[..., -1] / np.float32(255.0)
+        ink = (gray * alpha).sum(axis=1) / np.maximum(alpha.sum(axis=1), 1e-6)
+        background = np.where(ink > 127.5, 0, 255).astype(np.float32)[:, None]
+        gray -= background
+        gray *= alpha
+        gray += background
+    return gray.reshape(X.shape[:-1])
+
+
+def prepare_digits(X, size=EXPECTED_DIMENSION, box=DIGIT_BOX):
+    """Turning a batch of drawings into MNIST-style (N, size, size) uint8 digits
+
+    Images are converted to grayscale and inverted when their background is
+    light, so the ink is bright on black. The bounding box of the ink is
+    scaled to fit a `box` x `box` square and its center of mass is moved to
+    the center of the output. Cropping, scaling and centering are one
+    area-averaging resampling per axis, applied to the whole batch with two
+    batched matmuls.
+    """
+    X = np.asarray(X)
+    if len(X) > PREPARE_CHUNK_SIZE:
+        return np.concatenate(
+            [
+                prepare_digits(X[start : start + PREPARE_CHUNK_SIZE], size, box)
+                for start in range(0, len(X), PREPARE_CHUNK_SIZE)
+            ]
+        )
+    # Both branches return a new float32 array, modified in place below
+    X = to_grayscale(X) if X.ndim == 4 else X.astype(np.float32)
+    n, height, width = X.shape
+    if height < size or width < size:
+        raise ValueError(f"Images must be at least {size}x{size}, got {height}x{width}")
+    if n == 0:
+        return np.empty((0, size, size), dtype=np.uint8)
+
+    border = np.concatenate([X[:, 0], X[:, -1], X[:, :, 0], X[:, :, -1]], axis=1)
+    light = np.median(border, axis=1) > 127.5
+    np.subtract(255, X, out=X, where=light[:, None, None])
+    ink = X > INK_THRESHOLD * 255
+    X *= ink
+
+    ink_rows, ink_cols = ink.any(axis=2), ink.any(axis=1)
+    has_ink = ink_rows.any(axis=1)
+    extent = np.maximum(
+        height - ink_rows[:, ::-1].argmax(axis=1) - ink_rows.argmax(axis=1),
+        width - ink_cols[:, ::-1].argmax(axis=1) - ink_cols.argmax(axis=1),
+    )
+    # Input pixels per output pixel; blank images are plainly downsampled
+    scale = np.where(has_ink, extent / box, max(height, width) / size)
+
+    mass = np.maximum(X.sum(axis=(1, 2)), 1e-6)
+    center_y = X.sum(axis=2) @ (np.arange(height) + 0.5) / mass
+    center_x = X.sum(axis=1) @ (np.arange(width) + 0.5) / mass
+    center_y = np.where(has_ink, center_y, height / 2)
+    center_x = np.where(has_ink, center_x, width / 2)
+
+    rows = _area_weights(center_y - scale * size / 2, scale, size, height)
+    cols = _area_weights(center_x - scale * size / 2, scale, size, width)
+    Y = rows @ X @ cols.transpose(0, 2, 1)
+    return np.clip(np.rint(Y), 0, 255).astype(np.uint8)
+
+
+def _area_weights(origin, scale, size, length):
+    # (N, size, length) share of each input pixel covered by each output
+    # pixel, output pixel i spanning [origin + i * scale, origin + (i + 1) * scale)
+    edges = origin[:, None] + np.arange(size + 1) * scale[:, None]
+    pixels = np.arange(length)
+    overlap = np.minimum(edges[:, 1:, None], pixels + 1) - np.maximum(
+        edges[:, :-1, None], pixels
+    )
+    return (np.maximum(overlap, 0) / scale[:, None, None]).astype(np.float32)
+
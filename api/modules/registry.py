@@ -0,0 +1,159 @@
+from os.path import join, exists, getmtime
+from collections import namedtuple
+from datetime import datetime, timezone
+from os import listdir
+from loguru import logger
+import numpy as np
+import threading
+import hashlib
+import re
+
+ActiveModel = namedtuple("ActiveModel", ["version", "model"])
+
+MODEL_PATTERN = re.compile(r"^(cnn_.+)\.keras$")
+
+
+class ModelRegistry:
+    """Versioned models of the models directory, with one active version
+
+    Every `cnn_*.keras` file is a version named after its file stem
+    (`cnn_latest`, `cnn_2025-07-11T07:00:47Z`, ...). `activate` loads and
+    warms a version up before swapping it in with a single reference
+    assignment, so batches already running keep the model they started with.
+
+    Other versions can be kept loaded next to it with `retain`, to serve
+    challenger, shadow and ensemble traffic.
+    """
+
+    def __init__(self, models_dir, load_fn, predict_fn, input_shape=(28, 28)):
+        self.models_dir = models_dir
+        self.load_fn = load_fn
+        self.predict_fn = predict_fn
+        self.input_shape = input_shape
+        self.active = None
+        self.history = []
+        self.loaded = {}
+        self._lock = threading.Lock()
+
+    @property
+    def active_version(self):
+        active = self.active
+        return active.version if active else None
+
+    def path(self, version):
+        return join(self.models_dir, f"{version}.keras")
+
+    def versions(self):
+        """Listing the available versions, oldest first, `cnn_latest` last"""
+        if not exists(self.models_dir):
+            return []
+        versions = []
+        for name in listdir(self.models_dir):
+            match = MODEL_PATTERN.match(name)
+            if match:
+                version = match.group(1)
+                modified_at = datetime.fromtimestamp(
+                    getmtime(self.path(version)), tz=timezone.utc
+                )
+                versions.append(
+                    {
+                        "version": version,
+                        "modified_at": modified_at.isoformat(),
+                        "active": version == self.active_version,
+                    }
+                )
+        return sorted(versions, key=lambda item: _sort_key(item["version"]))
+
+    def load(self, version):
+        """Loading a version and running a dummy batch through it"""
+        path = self.path(version)
+        if not exists(path):
+            raise FileNotFoundError(f"No model file for version {version}")
+        model = self.load_fn(path)
+        self.predict_fn(model, np.zeros((1, *self.input_shape), dtype=np.float32))
+        return model
+
+    def activate(self, version, remember=True):
+        """Loading, warming up and swapping in a version"""
+        model = self.load(version)
+        with self._lock:
+            previous = self.active
+            self.active = ActiveModel(version, model)
+            if remember and previous is not None:
+                self.history.append(previous.version)
+        logger.info(
+            f"Model {version} activated"
+            f" (previously {previous.version if previous else None})"
+        )
+        return version
+
+    def rollback(self):
+        """Re-activating the version that was active before the current one"""
+        with self._lock:
+            if not self.history:
+                raise LookupError("No previous model version to roll back to")
+            version = self.history[-1]
+        self.activate(version, remember=False)
+        with self._lock:
+            self.history.pop()
+        return version
+
+    def retain(self, versions):
+        """Keeping exactly these versions loaded next to the active model
+
+        Versions already loaded, the active one included, are reused; the
+        others are loaded and warmed up before any is swapped in.
+        """
+        with self._lock:
+            active = self.active
+            loaded = dict(self.loaded)
+        if active is not None:
+            loaded.setdefault(active.version, active.model)
+        retained = {
+            version: loaded[version] if version in loaded else self.load(version)
+            for version in versions
+        }
+        with self._lock:
+            self.loaded = retained
+
+    def predict(self, X, version=None):
+        """Running a batch through the active model, or through a retained
+        version, returning the outputs and the version that produced them"""
+        active = self.active
+        if active is None:
+            raise RuntimeError("No model is active")
+        if version is None or version == active.version:
+            return self.predict_fn(active.model, X), active.version
+        model = self.loaded.get(version)
+        if model is None:
+            raise LookupError(f"Model {version} is not loaded")
+        return self.predict_fn(model, X), version
+
+    def predict_ensemble(self, X, versions):
+        """Averaging the logits of several versions over the same batch,
+        returning them with the ensemble's version name"""
+        outputs = [self.predict(X, version)[0] for version in versions]
+        return np.mean(outputs, axis=0), ensemble_version(versions)
+
+
+def ensemble_version(versions):
+    """Naming an ensemble after its members, within the 64 characters of
+    `digits.model_version`"""
+    digest = hashlib.blake2b("+".join(sorted(versions)).encode(), digest_size=4)
+    return f"ensemble_{digest.hexdigest()}"
+
+
+def top_predictions(logits):
+    """Picking the predicted digit of each row of logits, with its softmax
+    probability as the confidence"""
+    logits = np.asarray(logits, dtype=np.float32)
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probabilities = exp / exp.sum(axis=-1, keepdims=True)
+    labels = probabilities.argmax(axis=-1)
+    return labels, np.take_along_axis(probabilities, labels[..., None], -1)[..., 0]
+
+
+def _sort_key(version):
+    if version == "cnn_latest":
+        return (1, "")
+    return (0, re.sub(r"\D", "", version))
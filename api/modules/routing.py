@@ -0,0 +1,57 @@
+from collections import namedtuple
+import random
+
+Routing = namedtuple(
+    "Routing",
+    ["challenger", "challenger_percent", "shadow", "ensemble"],
+    defaults=(None, 0.0, None, ()),
+)
+
+
+def parse_routing(challenger=None, challenger_percent=0.0, shadow=None, ensemble=()):
+    """Building a Routing from settings, blank versions meaning none"""
+    if isinstance(ensemble, str):
+        ensemble = ensemble.split(",")
+    routing = Routing(
+        challenger=challenger or None,
+        challenger_percent=float(challenger_percent),
+        shadow=shadow or None,
+        ensemble=tuple(
+            dict.fromkeys(version.strip() for version in ensemble if version.strip())
+        ),
+    )
+    if not 0 <= routing.challenger_percent <= 100:
+        raise ValueError("The challenger traffic share must be between 0 and 100%")
+    if len(routing.ensemble) == 1:
+        raise ValueError("An ensemble needs at least two model versions")
+    return routing
+
+
+def routing_versions(routing):
+    """Listing the versions a routing needs loaded besides the active model"""
+    versions = [routing.challenger, routing.shadow, *routing.ensemble]
+    return list(dict.fromkeys(version for version in versions if version))
+
+
+class TrafficRouter:
+    """Choosing the model serving each request
+
+    A `challenger_percent` share of requests goes to the challenger version,
+    the others to the active model, or to the average of the ensemble
+    versions' logits when an ensemble is set. The shadow version scores
+    requests in the background; its answers are stored, never served. The
+    routing is swapped as a whole, so a request sees either the previous
+    one or the new one.
+    """
+
+    def __init__(self, routing=None, rng=random.random):
+        self.routing = routing or Routing()
+        self.rng = rng
+
+    def choose(self):
+        """Returning the key of the model serving a request: None for the
+        active model, a version, or the tuple of an ensemble's versions"""
+        routing = self.routing
+        if routing.challenger and self.rng() * 100 < routing.challenger_percent:
+            return routing.challenger
+        return routing.ensemble or None
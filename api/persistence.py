@@ -0,0 +1,307 @@
+import asyncio
+from datetime import datetime, timezone
+from itertools import islice
+from os import makedirs
+from os.path import dirname
+import json
+
+from loguru import logger
+from sqlalchemy import case, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from executors import run_io
+from image_store import image_store
+from metrics import stage_timer
+from models import Digit, ModelEnsemble
+
+
+def new_digit_row(
+    uuid, predicted_label, confidence, model_version=None, inference_ms=None
+):
+    """Building a complete `digits` row, so batches share the same columns
+
+    `img_path` is filled in with the image store reference once the image
+    is written, the shadow columns once the shadow model has scored it.
+    """
+    return {
+        "uuid": uuid,
+        "img_path": None,
+        "predicted_label": predicted_label,
+        "confidence": confidence,
+        "model_version": model_version,
+        "true_label": None,
+        "has_feedback": False,
+        "was_used_for_training": False,
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        "inference_ms": inference_ms,
+        "shadow_model_version": None,
+        "shadow_predicted_label": None,
+        "shadow_confidence": None,
+        "shadow_inference_ms": None,
+    }
+
+
+def write_digits(db, rows, img_arrays):
+    """Storing the images, then inserting every row with one executemany INSERT and a single commit"""
+    with stage_timer("image_write"):
+        for row, img_array in zip(rows, img_arrays):
+            row["img_path"] = image_store.put(img_array)
+
+    try:
+        with stage_timer("db_commit"):
+            db.execute(insert(Digit), rows)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _write_batch(rows, img_arrays):
+    db = SessionLocal()
+    try:
+        write_digits(db, rows, img_arrays)
+    finally:
+        db.close()
+
+
+def update_digits(rows):
+    """Building one UPDATE giving every digit of `rows` its own values
+
+    A single statement rather than an executemany UPDATE, so the PostgreSQL
+    stats triggers apply all the rows at once, in key order.
+    """
+    values = {}
+    for column in {column for row in rows for column in row} - {"uuid"}:
+        values[column] = case(
+            *(
+                (Digit.uuid == row["uuid"], row[column])
+                for row in rows
+                if column in row
+            ),
+            else_=getattr(Digit, column),
+        )
+    return (
+        update(Digit)
+        .where(Digit.uuid.in_([row["uuid"] for row in rows]))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def write_shadow_scores(rows):
+    """Storing shadow scores on committed digits with one UPDATE"""
+    db = SessionLocal()
+    try:
+        db.execute(update_digits(rows))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def record_ensemble(version, members):
+    """Storing the versions an ensemble version averages, the first time it
+    serves, so its digits can be traced back to them"""
+    db = SessionLocal()
+    try:
+        if db.get(ModelEnsemble, version) is None:
+            db.add(ModelEnsemble(version=version, members=",".join(members)))
+            db.commit()
+    except IntegrityError:
+        # Recorded by another worker meanwhile
+        db.rollback()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _write_each(rows, img_arrays):
+    # Row by row, so one bad row does not hold back the others. Returns the
+    # rows that could not be written.
+    failed = []
+    for row, img_array in zip(rows, img_arrays):
+        try:
+            _write_batch([row], [img_array])
+        except Exception as err:
+            logger.error(f"Failed to persist digit {row['uuid']}: {err}")
+            failed.append(row)
+    return failed
+
+
+def _dead_letter(path, rows):
+    # One JSON `digits` row per line, to be replayed once the cause is fixed
+    makedirs(dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as file:
+        for row in rows:
+            file.write(json.dumps(row, default=str) + "\n")
+
+
+class WriteBehindQueue:
+    """Persisting submitted images and Digit rows in the background
+
+    `submit` only records the row; a flusher writes pending rows every
+    `flush_interval_ms`, or as soon as `batch_size` of them are waiting.
+    Rows stay reachable through `update` until they are committed, so
+    feedback can be applied to a prediction that is still queued.
+
+    A batch that fails is put back in front of the queue. After
+    `max_retries` failures its rows are written one by one, and those that
+    still fail are appended to the `dead_letter_path` JSON lines file
+    rather than retried forever.
+
+    The queue belongs to its process: under gunicorn, a digit predicted by
+    one worker is not visible to the others until it is flushed.
+    """
+
+    def __init__(
+        self,
+        batch_size=64,
+        flush_interval_ms=200,
+        max_pending=1024,
+        max_retries=3,
+        dead_letter_path="./data/dead_letter.jsonl",
+    ):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(1.0, float(flush_interval_ms)) / 1000
+        self.max_pending = max(self.batch_size, int(max_pending))
+        self.max_retries = max(1, int(max_retries))
+        self.dead_letter_path = dead_letter_path
+        self._pending = {}
+        self._failures = {}
+        self._in_flight = {}
+        self._wakeup = None
+        self._lock = None
+        self._flusher = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._flusher is not None and not self._flusher.done()
+
+    async def start(self):
+        """Starting the background flusher"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        self._flusher = asyncio.create_task(self._run())
+        logger.info(
+            f"Write-behind queue started (batch_size={self.batch_size}, "
+            f"flush_interval_ms={self.flush_interval * 1000:g})"
+        )
+
+    async def stop(self):
+        """Stopping the flusher and draining every pending row"""
+        if self._flusher is None:
+            return
+        # Not cancelled: a flush in progress finishes, failure handling
+        # included, before the final drain
+        self._stopping = True
+        self._wakeup.set()
+        await self._flusher
+        self._flusher = None
+
+        await self.flush()
+        if self._pending:
+            logger.error(f"{len(self._pending)} rows could not be persisted on shutdown")
+        logger.info("Write-behind queue drained and stopped")
+
+    async def submit(self, row, img_array):
+        """Queuing a row and its image, or writing them right away when the flusher is not running"""
+        if not self.running:
+            await run_io(_write_batch, [row], [img_array])
+            return
+
+        self._pending[row["uuid"]] = (row, img_array)
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def update(self, uuid, **fields):
+        """Applying fields to a row that is not committed yet
+
+        Returns the updated row, or None when the row is not queued
+        (it is already in the database, or never existed).
+        """
+        while True:
+            if uuid in self._pending:
+                row, _ = self._pending[uuid]
+                row.update(fields)
+                return dict(row)
+            done = self._in_flight.get(uuid)
+            if done is None:
+                return None
+            await done.wait()
+
+    async def flush(self):
+        """Writing every pending row, batch by batch"""
+        async with self._lock:
+            while self._pending:
+                uuids = list(islice(self._pending, self.batch_size))
+                batch = [self._pending.pop(uuid) for uuid in uuids]
+                done = asyncio.Event()
+                for uuid in uuids:
+                    self._in_flight[uuid] = done
+
+                try:
+                    await run_io(
+                        _write_batch,
+                        [row for row, _ in batch],
+                        [img_array for _, img_array in batch],
+                    )
+                    logger.debug("Persisted a batch of {} digits", len(batch))
+                except Exception as err:
+                    failures = 1 + max(self._failures.pop(uuid, 0) for uuid in uuids)
+                    if failures >= self.max_retries:
+                        await self._give_up(batch, err)
+                        continue
+                    logger.error(
+                        f"Failed to persist {len(batch)} digits, will retry: {err}"
+                    )
+                    self._failures.update(dict.fromkeys(uuids, failures))
+                    self._pending = {**dict(zip(uuids, batch)), **self._pending}
+                    return
+                else:
+                    for uuid in uuids:
+                        self._failures.pop(uuid, None)
+                finally:
+                    for uuid in uuids:
+                        self._in_flight.pop(uuid, None)
+                    done.set()
+
+    async def _give_up(self, batch, err):
+        # The batch failed max_retries times: the rows that cannot be written
+        # on their own go to the dead-letter file
+        logger.error(
+            f"Failed to persist {len(batch)} digits {self.max_retries} times, "
+            f"writing them one by one: {err}"
+        )
+        failed = await run_io(
+            _write_each,
+            [row for row, _ in batch],
+            [img_array for _, img_array in batch],
+        )
+        if not failed:
+            return
+        try:
+            await run_io(_dead_letter, self.dead_letter_path, failed)
+            logger.error(f"{len(failed)} digits written to {self.dead_letter_path}")
+        except OSError as err:
+            logger.error(f"{len(failed)} digits could not be dead-lettered: {err}")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._stopping:
+                await self.flush()
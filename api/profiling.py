@@ -0,0 +1,170 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from os import makedirs
+from os.path import basename, join
+from loguru import logger
+import threading
+import random
+import time
+import sys
+
+from auth import admin_token_matches
+from config import (
+    PROFILING_ENABLED,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_INTERVAL_MS,
+    PROFILING_DIR,
+)
+
+PROFILE_HEADER = b"x-profile"
+
+# Span durations of the request being profiled, None otherwise. Executor jobs
+# run in a copy of the request context, so their spans land in the same dict.
+_spans = ContextVar("spans", default=None)
+
+
+def record_span(name, seconds):
+    """Adding a duration to the current request's Server-Timing breakdown"""
+    spans = _spans.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name):
+    """Timing a `with` block into the current request's Server-Timing breakdown"""
+    if _spans.get() is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started_at)
+
+
+def server_timing(spans, total):
+    """Formatting spans, in seconds, as a Server-Timing header value"""
+    entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in spans.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+class StackSampler:
+    """Statistical profiler sampling the Python stacks of every thread
+
+    A background thread records all stacks every `interval` seconds; `dump`
+    writes them as folded stacks (`thread;outer;...;inner count`), the input
+    of flamegraph.pl, speedscope and most flamegraph viewers. Other requests
+    served meanwhile are sampled too.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({basename(code.co_filename)}:"
+                        f"{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """Adding a Server-Timing span breakdown to profiled responses
+
+    Requests are profiled when PROFILING_ENABLED is set, or when they carry an
+    X-Profile header holding the admin token, which requires one to be set. A
+    PROFILING_SAMPLE_RATE share of them also runs under a StackSampler whose
+    folded stacks are written to PROFILING_DIR. Other requests only pay for a
+    header lookup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._sampling = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._profiled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        spans = {}
+        token = _spans.set(spans)
+        started_at = time.perf_counter()
+        sampler = self._start_sampler()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                value = server_timing(spans, time.perf_counter() - started_at)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", value.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            if sampler is not None:
+                self._dump(sampler, scope)
+
+    def _profiled(self, scope):
+        if PROFILING_ENABLED:
+            return True
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return admin_token_matches(value.decode("latin-1"))
+        return False
+
+    def _start_sampler(self):
+        # One sampled request at a time, as the sampler sees every thread
+        if random.random() >= PROFILING_SAMPLE_RATE:
+            return None
+        if not self._sampling.acquire(blocking=False):
+            return None
+        sampler = StackSampler(PROFILING_INTERVAL_MS / 1000)
+        sampler.start()
+        return sampler
+
+    def _dump(self, sampler, scope):
+        try:
+            sampler.stop()
+            makedirs(PROFILING_DIR, exist_ok=True)
+            route = scope["path"].strip("/").replace("/", "_") or "root"
+            stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+            path = join(PROFILING_DIR, f"{stamp}_{scope['method']}_{route}.folded")
+            sampler.dump(path)
+            logger.debug(f"Request profile written to {path}")
+        except OSError as err:
+            logger.error(f"Could not write the request profile: {err}")
+        finally:
+            self._sampling.release()
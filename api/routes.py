@@ -1,30 +1,167 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime
-from tensorflow import keras
 from loguru import logger
-from os.path import join
-from os import makedirs
-from PIL import Image
 import numpy as np
-import base64
-import io
+import uuid as uuid_lib
+import asyncio
+import time
 
-from schemas import PredictRequest, FeedbackRequest
-from modules.models import predict
-from database import get_db
+from config import (
+    PREDICT_MAX_BATCH_SIZE,
+    PREDICT_MAX_WAIT_MS,
+    PREDICT_BATCH_MAX_IMAGES,
+    FEEDBACK_BATCH_MAX_ITEMS,
+    PERSIST_BATCH_SIZE,
+    PERSIST_FLUSH_INTERVAL_MS,
+    PERSIST_MAX_PENDING,
+    PERSIST_MAX_RETRIES,
+    PERSIST_DEAD_LETTER_PATH,
+    SERVER_WORKERS,
+    MODELS_DIR,
+    INFERENCE_BACKEND,
+    ADMIN_TOKEN,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL_S,
+    SHADOW_MAX_PENDING,
+    SERVING_STATE_POLL_S,
+)
+from schemas import (
+    PredictRequest,
+    PredictResponse,
+    PredictBatchRequest,
+    FeedbackRequest,
+    FeedbackBatchRequest,
+    FeedbackResponse,
+    RoutingRequest,
+)
+from auth import admin_token_matches
+from executors import run_cpu, run_io
+from metrics import (
+    INFERENCE_BATCH_SIZE,
+    record_feedback,
+    record_predictions,
+    stage_timer,
+)
+from persistence import (
+    WriteBehindQueue,
+    new_digit_row,
+    record_ensemble,
+    update_digits,
+    write_digits,
+)
+from profiling import span
+from logging_config import annotate
+from modules.batching import BatchPredictor
+from modules.backends import get_backend
+from modules.cache import PredictionCache, image_digest
+from modules.registry import ModelRegistry, ensemble_version, top_predictions
+from modules.routing import TrafficRouter, parse_routing, routing_versions
+from modules.preprocessing import (
+    decode_image,
+    decode_images,
+    decode_raw,
+    load_npy,
+    normalize,
+)
+from database import get_db, get_async_db
 from models import Digit
+from serving_state import ServingState
+from shadow import ShadowScorer
+from stats import read_model_evidence, read_stats
 
 router = APIRouter()
 
-model_path = join(".", "models", "cnn_latest.keras")
-try:
-    model = keras.models.load_model(model_path)
-except Exception as error:
-    logger.error(f"Error loading model from {model_path}: {error}")
+backend = get_backend(INFERENCE_BACKEND)
+registry = ModelRegistry(MODELS_DIR, backend.load, backend.predict)
+traffic_router = TrafficRouter()
 
 
-EXPECTED_DIMENSION = 28
+def _predict(X, key=None):
+    # One forward pass of a uint8 batch, timed along with its normalization,
+    # through the model a routing key names: the active model by default, a
+    # version, or the tuple of an ensemble's versions. Returns the outputs,
+    # the version that produced them and the duration of the pass in ms.
+    INFERENCE_BATCH_SIZE.observe(len(X))
+    started_at = time.perf_counter()
+    with stage_timer("inference"):
+        X = normalize(X)
+        if isinstance(key, tuple):
+            predictions, model_version = registry.predict_ensemble(X, key)
+        else:
+            predictions, model_version = registry.predict(X, key)
+    return predictions, model_version, (time.perf_counter() - started_at) * 1000
+
+
+def _predict_rows(X, key=None):
+    # One (output row, model version, inference ms) per sample of the batch
+    predictions, model_version, inference_ms = _predict(X, key)
+    return [(row, model_version, inference_ms) for row in predictions]
+
+
+async def apply_routing(routing):
+    """Loading the versions a routing needs, then moving traffic to it"""
+    previous = routing_versions(traffic_router.routing)
+    await run_cpu(registry.retain, previous + routing_versions(routing))
+    traffic_router.routing = routing
+
+    # The versions left out stay loaded until the samples already submitted
+    # to them, queued or being scored in the shadow, have been answered
+    dropped = set(previous) - set(routing_versions(routing))
+
+    def uses_dropped(key):
+        return bool(dropped.intersection(key if isinstance(key, tuple) else [key]))
+
+    if dropped:
+        await batch_predictor.drain(uses_dropped)
+        await shadow_predictor.drain(uses_dropped)
+    await run_cpu(registry.retain, routing_versions(routing))
+    logger.info(f"Model routing applied: {routing}")
+
+    if routing.ensemble:
+        try:
+            await run_io(
+                record_ensemble, ensemble_version(routing.ensemble), routing.ensemble
+            )
+        except Exception as err:
+            logger.error(f"Failed to record the ensemble {routing.ensemble}: {err}")
+
+
+batch_predictor = BatchPredictor(
+    _predict_rows,
+    max_batch_size=PREDICT_MAX_BATCH_SIZE,
+    max_wait_ms=PREDICT_MAX_WAIT_MS,
+    run=run_cpu,
+)
+
+# Shadow scoring gets its own batches, so it never delays served requests
+shadow_predictor = BatchPredictor(
+    _predict_rows,
+    max_batch_size=PREDICT_MAX_BATCH_SIZE,
+    max_wait_ms=PREDICT_MAX_WAIT_MS,
+    run=run_cpu,
+)
+
+prediction_cache = PredictionCache(
+    max_entries=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL_S
+)
+
+write_behind = WriteBehindQueue(
+    batch_size=PERSIST_BATCH_SIZE,
+    flush_interval_ms=PERSIST_FLUSH_INTERVAL_MS,
+    max_pending=PERSIST_MAX_PENDING,
+    max_retries=PERSIST_MAX_RETRIES,
+    dead_letter_path=PERSIST_DEAD_LETTER_PATH,
+)
+
+# Activations and routings are shared by every worker through the database
+serving_state = ServingState(poll_interval_s=SERVING_STATE_POLL_S)
+
+shadow_scorer = ShadowScorer(
+    shadow_predictor, traffic_router, write_behind, max_pending=SHADOW_MAX_PENDING
+)
 
 
 @router.get("/")
@@ -37,48 +174,126 @@ async def heath():
     return {"status": "ok"}
 
 
-@router.post("/predict")
-async def predict_digit(predictRequest: PredictRequest, db: Session = Depends(get_db)):
-    img_bytes = base64.b64decode(predictRequest.image)
-    img_pil = Image.open(io.BytesIO(img_bytes))
-    img_pil = img_pil.convert("L").resize((EXPECTED_DIMENSION, EXPECTED_DIMENSION))
+@router.get("/ready")
+async def ready(response: Response):
+    """Reporting whether a model is loaded and warm, unlike /health which only
+    tells the process is up"""
+    model_version = registry.active_version
+    if model_version is None:
+        response.status_code = 503
+        return {"status": "not ready", "model_version": None}
+    return {"status": "ready", "model_version": model_version}
+
 
-    images_dir = "./data/images"
-    makedirs(images_dir, exist_ok=True)
+# The predict routes read their bodies by content type, so the bodies
+# FastAPI cannot infer are declared for the OpenAPI schema here
+_RAW_IMAGE = {"schema": {"type": "string", "format": "binary"}}
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    image_path = join(images_dir, f"image_{timestamp}.png")
+_PREDICT_OPENAPI = {
+    "parameters": [
+        {
+            "name": "X-Image-Channels",
+            "in": "header",
+            "required": False,
+            "description": "Channels of an application/octet-stream image",
+            "schema": {"type": "integer", "enum": [1, 3, 4], "default": 1},
+        }
+    ],
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": PredictRequest.model_json_schema()},
+            "application/octet-stream": _RAW_IMAGE,
+        },
+    },
+}
 
-    img_pil.save(image_path)
-    logger.info(f"Image saved to {image_path}")
+_PREDICT_BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": PredictBatchRequest.model_json_schema()},
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": _RAW_IMAGE["schema"]},
+                    "required": ["file"],
+                }
+            },
+        },
+    }
+}
 
-    img_array = (
-        np.array(img_pil).reshape(1, EXPECTED_DIMENSION, EXPECTED_DIMENSION) / 255.0
-    )
 
+@router.post("/predict", openapi_extra=_PREDICT_OPENAPI)
+async def predict_digit(request: Request):
+    """Predicting one image, sent either as a JSON PredictRequest with a base64
+    image or as an application/octet-stream raw uint8 buffer of a square image
+    whose channel count (1 by default, 3 or 4) is given in X-Image-Channels"""
+    _check_ready()
+    content_type = request.headers.get("content-type", "")
     try:
-        logger.info("Starting prediction...")
-        predictions = predict(model, img_array)
-        prediction = int(np.argmax(predictions))
-        confidence = float(predictions[prediction])
+        if content_type.startswith("application/octet-stream"):
+            channels = int(request.headers.get("x-image-channels", "1"))
+            img_array = await run_cpu(decode_raw, await request.body(), channels)
+        else:
+            predictRequest = PredictRequest.model_validate(await request.json())
+            img_array = await run_cpu(decode_image, predictRequest.image)
+    except ValidationError as err:
+        raise HTTPException(status_code=422, detail=err.errors())
+    except Exception as err:
+        logger.error(f"Invalid prediction payload: {err}")
+        raise HTTPException(status_code=422, detail=f"Invalid image: {err}")
 
-        logger.info(
-            f"The model predicted: {prediction} with a confidence of {confidence}"
-        )
+    try:
+        key = traffic_router.choose()
+        # Resubmitted drawings skip the forward pass. The cache holds a single
+        # version: the active model's, or the ensemble's standing in for it,
+        # which serve all traffic but the challenger's share.
+        digest = image_digest(img_array)
+        cacheable = not isinstance(key, str)
+        model_version = key
+        predictions = None
+        if cacheable:
+            model_version = ensemble_version(key) if key else registry.active_version
+            predictions = prediction_cache.get(digest, model_version)
+        cached = predictions is not None
+        inference_ms = None
+        if not cached:
+            # The batcher runs inference in its own task: this span holds the
+            # wait for a batch along with the forward pass
+            with span("predict"):
+                predictions, model_version, inference_ms = (
+                    await batch_predictor.predict(img_array, key)
+                )
+            if cacheable:
+                # A copy, so the cache does not keep the whole batch output alive
+                prediction_cache.put(digest, model_version, predictions.copy())
+        prediction, confidence = top_predictions(predictions)
+        prediction, confidence = int(prediction), float(confidence)
+        record_predictions([prediction], [confidence], model_version)
 
-        db_digit = Digit(
-            img_path=image_path,
+        row = new_digit_row(
+            uuid=str(uuid_lib.uuid4()),
             predicted_label=prediction,
             confidence=confidence,
+            model_version=model_version,
+            inference_ms=inference_ms,
+        )
+        await write_behind.submit(row, img_array)
+        shadow_scorer.submit([row["uuid"]], img_array[np.newaxis], model_version)
+        annotate(
+            digit_uuid=row["uuid"],
+            predicted_digit=prediction,
+            confidence=round(confidence, 4),
+            model_version=model_version,
+            cached=cached,
         )
-        db.add(db_digit)
-        db.commit()
-        db.refresh(db_digit)
 
         response = {
             "predicted_digit": prediction,
             "confidence": confidence,
-            "digit_uuid": db_digit.uuid,
+            "digit_uuid": row["uuid"],
         }
 
         return response
@@ -88,21 +303,389 @@ async def predict_digit(predictRequest: PredictRequest, db: Session = Depends(ge
         raise HTTPException(status_code=500, detail=detail_message)
 
 
-@router.post("/feedback")
+@router.post(
+    "/predict/batch",
+    response_model=list[PredictResponse],
+    openapi_extra=_PREDICT_BATCH_OPENAPI,
+)
+async def predict_digits(request: Request, db: Session = Depends(get_db)):
+    """Predicting N images in one forward pass, from a JSON list of base64
+    images or a multipart upload of a .npy array in the `file` field"""
+    _check_ready()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise ValueError("Missing .npy upload in the 'file' field")
+            img_arrays = await run_cpu(load_npy, await upload.read())
+        else:
+            batchRequest = PredictBatchRequest.model_validate(await request.json())
+            _check_batch_size(len(batchRequest.images))
+            img_arrays = await run_cpu(decode_images, batchRequest.images)
+        _check_batch_size(len(img_arrays))
+    except HTTPException:
+        raise
+    except ValidationError as err:
+        raise HTTPException(status_code=422, detail=err.errors())
+    except Exception as err:
+        logger.error(f"Invalid batch prediction payload: {err}")
+        raise HTTPException(status_code=422, detail=f"Invalid image batch: {err}")
+
+    if len(img_arrays) == 0:
+        return []
+
+    try:
+        # Counted by the batcher, so the chosen model stays loaded meanwhile
+        key = traffic_router.choose()
+        with batch_predictor.holding(key):
+            predictions, model_version, inference_ms = await run_cpu(
+                _predict, img_arrays, key
+            )
+        labels, confidences = top_predictions(predictions)
+        record_predictions(labels.tolist(), confidences.tolist(), model_version)
+
+        rows = [
+            new_digit_row(
+                uuid=str(uuid_lib.uuid4()),
+                predicted_label=int(label),
+                confidence=float(confidence),
+                model_version=model_version,
+                inference_ms=inference_ms,
+            )
+            for label, confidence in zip(labels, confidences)
+        ]
+
+        await run_io(write_digits, db, rows, img_arrays)
+        shadow_scorer.submit([row["uuid"] for row in rows], img_arrays, model_version)
+        annotate(images=len(rows), model_version=model_version)
+
+        return [
+            {
+                "predicted_digit": row["predicted_label"],
+                "confidence": row["confidence"],
+                "digit_uuid": row["uuid"],
+            }
+            for row in rows
+        ]
+    except Exception as err:
+        logger.error(f"An error occured during batch prediction: {err}")
+        detail_message = f"Something went wrong during batch prediction: {err}"
+        raise HTTPException(status_code=500, detail=detail_message)
+
+
+@router.post("/feedback", response_model=FeedbackResponse)
 async def provide_feedback(
-    feedbackRequest: FeedbackRequest, db: Session = Depends(get_db)
+    feedbackRequest: FeedbackRequest, db: AsyncSession = Depends(get_async_db)
 ):
+    annotate(
+        digit_uuid=feedbackRequest.digit_uuid, true_digit=feedbackRequest.true_digit
+    )
     try:
-        db_digit = (
-            db.query(Digit).filter(Digit.uuid == feedbackRequest.digit_uuid).first()
+        queued_digit = await write_behind.update(
+            feedbackRequest.digit_uuid,
+            true_label=feedbackRequest.true_digit,
+            has_feedback=True,
         )
-        db_digit.true_label = feedbackRequest.true_digit
-        db_digit.has_feedback = True
-        db.commit()
-        db.refresh(db_digit)
+        if queued_digit is not None:
+            record_feedback(
+                queued_digit["model_version"],
+                queued_digit["predicted_label"],
+                feedbackRequest.true_digit,
+            )
+            return queued_digit
 
-        return db_digit
+        with stage_timer("feedback_commit"):
+            db_digit = await _apply_feedback(
+                db, feedbackRequest.digit_uuid, feedbackRequest.true_digit
+            )
+        if db_digit is None and SERVER_WORKERS > 1:
+            await _wait_for_other_workers()
+            db_digit = await _apply_feedback(
+                db, feedbackRequest.digit_uuid, feedbackRequest.true_digit
+            )
     except Exception as err:
         logger.error(f"An error occured during feedback: {err}")
         detail_message = f"Something went wrong during feedback: {err}"
         raise HTTPException(status_code=500, detail=detail_message)
+
+    if db_digit is None:
+        raise HTTPException(
+            status_code=404, detail=f"Unknown digit {feedbackRequest.digit_uuid}"
+        )
+    record_feedback(
+        db_digit.model_version, db_digit.predicted_label, db_digit.true_label
+    )
+    return db_digit
+
+
+@router.post("/feedback/batch")
+async def provide_feedback_batch(
+    feedbackBatchRequest: FeedbackBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Applying many labels in one transaction; unknown digit UUIDs are
+    reported rather than failing the whole batch"""
+    if len(feedbackBatchRequest.feedbacks) > FEEDBACK_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {FEEDBACK_BATCH_MAX_ITEMS} feedbacks per batch are accepted",
+        )
+    try:
+        # The last label sent for a digit wins
+        labels = {
+            item.digit_uuid: item.true_digit for item in feedbackBatchRequest.feedbacks
+        }
+        queued = 0
+        for digit_uuid in list(labels):
+            queued_digit = await write_behind.update(
+                digit_uuid, true_label=labels[digit_uuid], has_feedback=True
+            )
+            if queued_digit is not None:
+                record_feedback(
+                    queued_digit["model_version"],
+                    queued_digit["predicted_label"],
+                    queued_digit["true_label"],
+                )
+                del labels[digit_uuid]
+                queued += 1
+
+        with stage_timer("feedback_commit"):
+            updated = await _apply_feedback_batch(db, labels)
+        missing = {
+            digit_uuid: label
+            for digit_uuid, label in labels.items()
+            if digit_uuid not in updated
+        }
+        if missing and SERVER_WORKERS > 1:
+            await _wait_for_other_workers()
+            updated.update(await _apply_feedback_batch(db, missing))
+        for digit_uuid, (model_version, predicted_label) in updated.items():
+            record_feedback(model_version, predicted_label, labels[digit_uuid])
+    except Exception as err:
+        logger.error(f"An error occured during batch feedback: {err}")
+        detail_message = f"Something went wrong during batch feedback: {err}"
+        raise HTTPException(status_code=500, detail=detail_message)
+
+    unknown = [digit_uuid for digit_uuid in labels if digit_uuid not in updated]
+    annotate(
+        feedbacks=len(feedbackBatchRequest.feedbacks),
+        queued=queued,
+        unknown=len(unknown),
+    )
+    return {"updated": queued + len(updated), "unknown": unknown}
+
+
+@router.get("/stats")
+async def stats(
+    hours: int = Query(default=24, ge=1, le=24 * 31),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Reporting prediction counts, accuracy and the confusion matrix, overall,
+    per model version and per hour, from incrementally maintained aggregates"""
+    return await read_stats(db, hours)
+
+
+@router.get("/stats/models")
+async def model_stats(
+    hours: int = Query(default=24, ge=1, le=24 * 31),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Comparing the served and shadow models of the last `hours` hours on
+    latency and feedback accuracy, to promote models on evidence"""
+    return await read_model_evidence(db, hours)
+
+
+def _check_admin_token(x_admin_token: str | None = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403, detail="Admin routes are disabled until ADMIN_TOKEN is set"
+        )
+    if not admin_token_matches(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/admin/models", dependencies=[Depends(_check_admin_token)])
+async def list_models():
+    return {
+        "active": registry.active_version,
+        "history": registry.history,
+        "versions": await run_io(registry.versions),
+    }
+
+
+@router.post(
+    "/admin/models/{version}/activate", dependencies=[Depends(_check_admin_token)]
+)
+async def activate_model(version: str):
+    if version not in {item["version"] for item in await run_io(registry.versions)}:
+        raise HTTPException(status_code=404, detail=f"Unknown model version {version}")
+    async with serving_state.lock:
+        try:
+            await run_cpu(registry.activate, version)
+            # Re-activating a version name can load retrained weights
+            prediction_cache.clear()
+            await _share_active_model()
+        except Exception as err:
+            logger.error(f"Failed to activate model {version}: {err}")
+            detail_message = f"Could not activate model {version}: {err}"
+            raise HTTPException(status_code=500, detail=detail_message)
+    return {"active": registry.active_version}
+
+
+@router.post("/admin/models/rollback", dependencies=[Depends(_check_admin_token)])
+async def rollback_model():
+    async with serving_state.lock:
+        try:
+            await run_cpu(registry.rollback)
+            prediction_cache.clear()
+            await _share_active_model()
+        except LookupError as err:
+            raise HTTPException(status_code=409, detail=str(err))
+        except Exception as err:
+            logger.error(f"Failed to roll back model: {err}")
+            detail_message = f"Could not roll back model: {err}"
+            raise HTTPException(status_code=500, detail=detail_message)
+    return {"active": registry.active_version}
+
+
+async def _share_active_model():
+    # Every activation gets its own value, so the other workers reload a
+    # version activated again with retrained weights
+    await serving_state.save(
+        "active_model",
+        {
+            "version": registry.active_version,
+            "history": registry.history,
+            "activated_at": time.time(),
+        },
+    )
+
+
+async def _apply_active_model(value):
+    # An activation shared by another worker
+    await run_cpu(registry.activate, value["version"], False)
+    registry.history = list(value["history"])
+    prediction_cache.clear()
+
+
+serving_state.on("active_model", _apply_active_model)
+
+
+@router.get("/admin/routing", dependencies=[Depends(_check_admin_token)])
+async def get_routing():
+    return _routing_response()
+
+
+@router.put("/admin/routing", dependencies=[Depends(_check_admin_token)])
+async def update_routing(routingRequest: RoutingRequest):
+    """Setting the challenger and its traffic share, the shadow model and the
+    ensemble; every version is loaded before traffic moves to it"""
+    try:
+        routing = parse_routing(**routingRequest.model_dump())
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
+    known = {item["version"] for item in await run_io(registry.versions)}
+    unknown = [version for version in routing_versions(routing) if version not in known]
+    if unknown:
+        raise HTTPException(
+            status_code=404, detail=f"Unknown model versions {', '.join(unknown)}"
+        )
+    async with serving_state.lock:
+        try:
+            await apply_routing(routing)
+            await serving_state.save("routing", routing._asdict())
+        except Exception as err:
+            logger.error(f"Failed to apply the model routing: {err}")
+            detail_message = f"Could not apply the model routing: {err}"
+            raise HTTPException(status_code=500, detail=detail_message)
+    return _routing_response()
+
+
+async def _apply_shared_routing(value):
+    # A routing set through another worker
+    await apply_routing(parse_routing(**value))
+
+
+serving_state.on("routing", _apply_shared_routing)
+
+
+def _routing_response():
+    routing = traffic_router.routing
+    return {
+        "active": registry.active_version,
+        "challenger": routing.challenger,
+        "challenger_percent": routing.challenger_percent,
+        "shadow": routing.shadow,
+        "ensemble": list(routing.ensemble),
+        "ensemble_version": (
+            ensemble_version(routing.ensemble) if routing.ensemble else None
+        ),
+    }
+
+
+def _check_ready():
+    if registry.active_version is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The model is still loading",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _check_batch_size(size):
+    if size > PREDICT_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {PREDICT_BATCH_MAX_IMAGES} images per batch are accepted",
+        )
+
+
+async def _wait_for_other_workers():
+    # A digit predicted by another gunicorn worker stays in that worker's
+    # write-behind queue, out of the database, for up to a flush interval
+    await asyncio.sleep(write_behind.flush_interval)
+
+
+async def _apply_feedback(db, digit_uuid, true_label):
+    # A single UPDATE ... RETURNING, which returns None for an unknown digit
+    db_digit = await db.scalar(
+        update(Digit)
+        .where(Digit.uuid == digit_uuid)
+        .values(true_label=true_label, has_feedback=True)
+        .returning(Digit)
+    )
+    await db.commit()
+    return db_digit
+
+
+async def _apply_feedback_batch(db, labels):
+    # Known digits are looked up first, as the UPDATE cannot tell which rows
+    # matched, then updated with a single statement.
+    # Returns the (model version, predicted label) of every updated digit.
+    if not labels:
+        return {}
+    known = {
+        digit_uuid: (model_version, predicted_label)
+        for digit_uuid, model_version, predicted_label in await db.execute(
+            select(Digit.uuid, Digit.model_version, Digit.predicted_label).where(
+                Digit.uuid.in_(labels)
+            )
+        )
+    }
+    if known:
+        await db.execute(
+            update_digits(
+                [
+                    {
+                        "uuid": digit_uuid,
+                        "true_label": labels[digit_uuid],
+                        "has_feedback": True,
+                    }
+                    for digit_uuid in known
+                ]
+            )
+        )
+    await db.commit()
+    return known
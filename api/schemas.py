@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, field_validator
+import uuid as uuid_lib
 
 
 class PredictRequest(BaseModel):
@@ -15,3 +17,41 @@ class FeedbackRequest(BaseModel):
     true_digit: int
     digit_uuid: str
     is_correct: bool
+
+    @field_validator("digit_uuid")
+    @classmethod
+    def canonical_uuid(cls, value):
+        # A malformed key is a 422 here rather than a 500 when it is bound as
+        # 16 bytes, and keys match whatever case they are sent in
+        return str(uuid_lib.UUID(value))
+
+
+class FeedbackResponse(BaseModel):
+    """A digit with its feedback, the same whether it is committed yet or
+    still queued for writing"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    uuid: str
+    predicted_label: int
+    confidence: float
+    model_version: str | None = None
+    true_label: int | None = None
+    has_feedback: bool
+    was_used_for_training: bool
+    created_at: datetime | None = None
+
+
+class FeedbackBatchRequest(BaseModel):
+    feedbacks: list[FeedbackRequest]
+
+
+class PredictBatchRequest(BaseModel):
+    images: list[str]
+
+
+class RoutingRequest(BaseModel):
+    challenger: str | None = None
+    challenger_percent: float = 0.0
+    shadow: str | None = None
+    ensemble: list[str] = []
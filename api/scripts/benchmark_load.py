@@ -0,0 +1,312 @@
+from os.path import abspath, dirname, join
+from tempfile import TemporaryDirectory
+from PIL import Image
+from os import environ
+import numpy as np
+import argparse
+import asyncio
+import base64
+import httpx
+import json
+import time
+import sys
+import io
+
+# Run as `python scripts/benchmark_load.py`, the in-process app imports from
+# api/ like the tests do
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from drawings import canvases
+
+parser = argparse.ArgumentParser(
+    description="Replay /predict and /feedback traffic against the API and "
+    "report latency percentiles, throughput and error rate as JSON"
+)
+parser.add_argument(
+    "--url",
+    help="Base URL of a running server (e.g. http://127.0.0.1:8000); "
+    "without it the app is served in-process through ASGI, on a temporary "
+    "database and image store",
+)
+parser.add_argument(
+    "--payloads",
+    help="JSON lines of recorded requests: {'path', 'json'} or "
+    "{'path', 'body_base64', 'headers'}; synthetic drawings are sent otherwise",
+)
+parser.add_argument(
+    "--save-payloads", help="Write the synthetic requests as JSON lines and exit"
+)
+parser.add_argument("--distinct", type=int, default=256, help="Synthetic drawings")
+parser.add_argument("--canvas", type=int, default=192)
+parser.add_argument(
+    "--raw", action="store_true", help="Send synthetic drawings as raw uint8 buffers"
+)
+parser.add_argument("--requests", type=int, default=1000)
+parser.add_argument(
+    "--concurrency",
+    type=int,
+    default=16,
+    help="Clients sending back to back (closed loop), unless --rate is given",
+)
+parser.add_argument(
+    "--rate",
+    type=float,
+    help="Open loop: requests per second arriving on a Poisson schedule, "
+    "regardless of how fast earlier ones complete",
+)
+parser.add_argument(
+    "--feedback-ratio",
+    type=float,
+    default=0.2,
+    help="Share of successful predictions followed by a /feedback",
+)
+parser.add_argument("--warmup", type=int, default=50)
+parser.add_argument("--timeout", type=float, default=30.0)
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--output", help="Write the report to this file")
+parser.add_argument("--baseline", help="Report to compare against")
+parser.add_argument(
+    "--tolerance",
+    type=float,
+    default=0.2,
+    help="Accepted relative slowdown of a percentile or of the throughput",
+)
+args = parser.parse_args()
+
+rng = np.random.default_rng(args.seed)
+
+
+def synthetic_payloads():
+    payloads = []
+    for X in canvases(args.distinct, args.canvas, args.seed):
+        if args.raw:
+            payloads.append(
+                {
+                    "path": "/predict",
+                    "body_base64": base64.b64encode(X.tobytes()).decode(),
+                    "headers": {
+                        "Content-Type": "application/octet-stream",
+                        "X-Image-Channels": "4",
+                    },
+                }
+            )
+            continue
+        buffer = io.BytesIO()
+        Image.fromarray(X).save(buffer, format="PNG")
+        image = base64.b64encode(buffer.getvalue()).decode()
+        payloads.append({"path": "/predict", "json": {"image": image}})
+    return payloads
+
+
+def load_payloads(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def request_kwargs(payload):
+    if "json" in payload:
+        return {"json": payload["json"]}
+    return {
+        "content": base64.b64decode(payload["body_base64"]),
+        "headers": payload.get("headers", {}),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, path, latency, ok):
+        self.latencies.setdefault(path, []).append(latency)
+        self.errors[path] = self.errors.get(path, 0) + (not ok)
+
+
+async def send(client, recorder, payload, scheduled_at):
+    # Latency runs from the scheduled start, so an open-loop request kept
+    # waiting by a saturated server is charged for the wait
+    try:
+        response = await client.post(payload["path"], **request_kwargs(payload))
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.add(payload["path"], time.perf_counter() - scheduled_at, ok)
+
+    if ok and payload["path"] == "/predict" and rng.random() < args.feedback_ratio:
+        feedback = {
+            "digit_uuid": response.json()["digit_uuid"],
+            "true_digit": int(rng.integers(0, 10)),
+            "is_correct": False,
+        }
+        started_at = time.perf_counter()
+        try:
+            response = await client.post("/feedback", json=feedback)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        recorder.add("/feedback", time.perf_counter() - started_at, ok)
+
+
+async def closed_loop(client, recorder, payloads, count):
+    next_index = iter(range(count))
+
+    async def worker():
+        for index in next_index:
+            payload = payloads[index % len(payloads)]
+            await send(client, recorder, payload, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def open_loop(client, recorder, payloads, count):
+    tasks = []
+    scheduled_at = time.perf_counter()
+    for index in range(count):
+        scheduled_at += rng.exponential(1 / args.rate)
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        payload = payloads[index % len(payloads)]
+        tasks.append(asyncio.create_task(send(client, recorder, payload, scheduled_at)))
+    await asyncio.gather(*tasks)
+
+
+def summarize(latencies, errors, elapsed):
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(latencies_ms.max()), 3),
+        },
+    }
+
+
+async def wait_ready(client):
+    deadline = time.perf_counter() + 120
+    while (await client.get("/ready")).status_code != 200:
+        if time.perf_counter() > deadline:
+            raise TimeoutError("The API did not report ready within 120s")
+        await asyncio.sleep(0.1)
+
+
+async def run(client, payloads):
+    await wait_ready(client)
+    if args.warmup:
+        await closed_loop(client, Recorder(), payloads, args.warmup)
+
+    recorder = Recorder()
+    started_at = time.perf_counter()
+    if args.rate:
+        await open_loop(client, recorder, payloads, args.requests)
+    else:
+        await closed_loop(client, recorder, payloads, args.requests)
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "config": {
+            "target": args.url or "asgi",
+            "mode": "open" if args.rate else "closed",
+            "rate": args.rate,
+            "concurrency": None if args.rate else args.concurrency,
+            "requests": args.requests,
+            "payloads": args.payloads or ("raw" if args.raw else "json"),
+            "distinct": len(payloads),
+            "feedback_ratio": args.feedback_ratio,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "routes": {
+            path: summarize(latencies, recorder.errors[path], elapsed)
+            for path, latencies in recorder.latencies.items()
+        },
+    }
+
+
+async def main(payloads):
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    if args.url:
+        async with httpx.AsyncClient(
+            base_url=args.url, timeout=args.timeout, limits=limits
+        ) as client:
+            return await run(client, payloads)
+
+    with TemporaryDirectory(prefix="benchmark_load_") as workdir:
+        # The replayed predictions and feedback land in a throwaway database
+        # and image store, not in the configured ones; the settings are read
+        # when the app is imported
+        environ.update(
+            DATABASE_URL=f"sqlite:///{join(workdir, 'app.db')}",
+            IMAGE_STORE_DIR=join(workdir, "images"),
+            DATASET_DIR=join(workdir, "dataset"),
+            PERSIST_DEAD_LETTER_PATH=join(workdir, "dead_letter.jsonl"),
+        )
+        from main import app
+
+        # httpx does not run the lifespan hook, which starts the pools, the
+        # batcher and the model loading
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://asgi", timeout=args.timeout
+            ) as client:
+                return await run(client, payloads)
+
+
+def regressions(report, baseline):
+    found = []
+    for path, result in report["routes"].items():
+        reference = baseline.get("routes", {}).get(path)
+        if reference is None:
+            continue
+        for name in ("p50", "p95", "p99"):
+            limit = reference["latency_ms"][name] * (1 + args.tolerance)
+            if result["latency_ms"][name] > limit:
+                found.append(
+                    f"{path} {name} {result['latency_ms'][name]}ms > {limit:.3f}ms"
+                )
+        limit = reference["throughput_rps"] * (1 - args.tolerance)
+        if result["throughput_rps"] < limit:
+            found.append(f"{path} throughput {result['throughput_rps']} < {limit:.1f}")
+        if result["error_rate"] > reference["error_rate"]:
+            found.append(
+                f"{path} error rate {result['error_rate']} > {reference['error_rate']}"
+            )
+    return found
+
+
+payloads = load_payloads(args.payloads) if args.payloads else synthetic_payloads()
+if args.save_payloads:
+    with open(args.save_payloads, "w") as file:
+        file.writelines(json.dumps(payload) + "\n" for payload in payloads)
+    print(f"{len(payloads)} payloads written to {args.save_payloads}")
+    sys.exit(0)
+
+report = asyncio.run(main(payloads))
+output = json.dumps(report, indent=2)
+if args.output:
+    with open(args.output, "w") as file:
+        file.write(output + "\n")
+print(output)
+
+# Messages go to stderr as is: importing the app in-process replaces the
+# loguru sinks with its log file
+if args.baseline:
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("config") != report["config"]:
+        print(
+            "Warning: the baseline was run with another configuration", file=sys.stderr
+        )
+    found = regressions(report, baseline)
+    for regression in found:
+        print(f"Regression: {regression}", file=sys.stderr)
+    if found:
+        sys.exit(1)
+    print(f"No regression against {args.baseline}", file=sys.stderr)
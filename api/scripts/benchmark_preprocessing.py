@@ -0,0 +1,65 @@
+from os.path import abspath, dirname
+from PIL import Image
+from loguru import logger
+import numpy as np
+import argparse
+import base64
+import json
+import time
+import sys
+import io
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from drawings import canvases
+from modules.preprocessing import decode_image, decode_raw, prepare_digits
+
+parser = argparse.ArgumentParser(
+    description="Time the preprocessing of canvas drawings, per image"
+)
+parser.add_argument("--canvas", type=int, default=192)
+parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+parser.add_argument("--repeat", type=int, default=20)
+args = parser.parse_args()
+
+
+def per_image_ms(fn, count):
+    fn()
+    started_at = time.perf_counter()
+    for _ in range(args.repeat):
+        fn()
+    return round((time.perf_counter() - started_at) / args.repeat / count * 1000, 4)
+
+
+def pil_resize(image_base64):
+    # The original pipeline: PIL grayscale and resize, float64 scaling
+    img_pil = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+    img_pil = img_pil.convert("L").resize((28, 28))
+    return np.array(img_pil).reshape(1, 28, 28) / 255.0
+
+
+results = {}
+for batch_size in args.batch_sizes:
+    X = canvases(batch_size, args.canvas)
+    pngs = []
+    for image in X:
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, format="PNG")
+        pngs.append(base64.b64encode(buffer.getvalue()).decode())
+    raws = [image.tobytes() for image in X]
+
+    results[batch_size] = {
+        "pil_convert_resize": per_image_ms(
+            lambda: [pil_resize(png) for png in pngs], batch_size
+        ),
+        "decode_image": per_image_ms(
+            lambda: [decode_image(png) for png in pngs], batch_size
+        ),
+        "decode_raw": per_image_ms(
+            lambda: [decode_raw(raw, channels=4) for raw in raws], batch_size
+        ),
+        "prepare_digits_batch": per_image_ms(lambda: prepare_digits(X), batch_size),
+    }
+    logger.info(f"Batch of {batch_size}: {results[batch_size]} ms per image")
+
+print(json.dumps(results, indent=2))
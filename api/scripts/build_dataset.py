@@ -0,0 +1,16 @@
+from loguru import logger
+
+from config import DATASET_DIR
+from database import SessionLocal
+from image_store import image_store
+from modules.dataset import DigitDataset, append_feedback_digits
+
+dataset = DigitDataset(DATASET_DIR)
+
+db = SessionLocal()
+try:
+    start, end = append_feedback_digits(db, dataset, image_store.read)
+finally:
+    db.close()
+
+logger.info(f"Dataset in {DATASET_DIR} now holds {end} digits ({end - start} new)")
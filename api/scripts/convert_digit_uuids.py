@@ -0,0 +1,72 @@
+"""Converting the keys of the digits table to the storage DIGIT_UUID_BINARY
+selects: 36-character strings, or 16 bytes
+
+Migrations always leave the keys as strings, so that a database does not
+depend on the settings it was migrated with. Run this with the API stopped,
+after changing DIGIT_UUID_BINARY.
+"""
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from loguru import logger
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+import uuid as uuid_lib
+
+from config import DIGIT_UUID_BINARY
+from database import engine
+from models import Digit, stats_trigger_statements
+
+
+def uuid_is_binary(connection):
+    columns = sa.inspect(connection).get_columns("digits")
+    uuid_type = next(column["type"] for column in columns if column["name"] == "uuid")
+    return not isinstance(uuid_type, sa.String)
+
+
+def convert_uuids(connection, binary):
+    op = Operations(MigrationContext.configure(connection))
+    if connection.dialect.name == "postgresql":
+        op.alter_column(
+            "digits",
+            "uuid",
+            type_=postgresql.UUID(as_uuid=False) if binary else sa.String(36),
+            postgresql_using="uuid::uuid" if binary else "uuid::text",
+        )
+        return
+
+    # SQLite keeps BLOB values as they are in a text column, so keys are
+    # converted in place before the column type is changed
+    def convert(value):
+        if binary:
+            return uuid_lib.UUID(value).bytes
+        return str(uuid_lib.UUID(bytes=value))
+
+    connection.connection.driver_connection.create_function("convert_uuid", 1, convert)
+    connection.exec_driver_sql("UPDATE digits SET uuid = convert_uuid(uuid)")
+
+    # The table is rebuilt, which drops its triggers, and its partial indexes
+    # would be carried over without their predicates
+    for index in Digit.__table__.indexes:
+        index.drop(connection, checkfirst=True)
+    with op.batch_alter_table("digits", recreate="always") as batch_op:
+        batch_op.alter_column(
+            "uuid",
+            type_=sa.LargeBinary(16) if binary else sa.String(36),
+            existing_nullable=False,
+        )
+    for index in Digit.__table__.indexes:
+        index.create(connection)
+    if sa.inspect(connection).has_table("digit_stats"):
+        for statement in stats_trigger_statements(connection.dialect.name):
+            connection.exec_driver_sql(statement)
+
+
+with engine.begin() as connection:
+    if uuid_is_binary(connection) == DIGIT_UUID_BINARY:
+        logger.info("Digit keys already use the configured storage")
+    else:
+        convert_uuids(connection, DIGIT_UUID_BINARY)
+        logger.info(
+            f"Digit keys converted to {'16 bytes' if DIGIT_UUID_BINARY else 'strings'}"
+        )
@@ -0,0 +1,12 @@
+import numpy as np
+
+
+def canvases(count, size=192, seed=0):
+    """Drawing one black stroke per white RGBA canvas, like the Streamlit
+    drawing pad, at a random place"""
+    rng = np.random.default_rng(seed)
+    X = np.full((count, size, size, 4), 255, dtype=np.uint8)
+    for image in X:
+        top, left = rng.integers(0, size // 2, size=2)
+        image[top : top + size // 3, left : left + size // 8, :3] = 0
+    return X
@@ -0,0 +1,90 @@
+import tensorflow as tf
+from tensorflow.keras import datasets, models
+from os.path import join, abspath
+from os import replace
+from loguru import logger
+import numpy as np
+import argparse
+import json
+
+from modules.backends import TFLiteModel
+
+parser = argparse.ArgumentParser(
+    description="Export a .keras model to TFLite and check it against Keras"
+)
+parser.add_argument("--version", default="cnn_latest")
+parser.add_argument(
+    "--quantize",
+    action="store_true",
+    help="Apply int8 post-training quantization calibrated on MNIST",
+)
+parser.add_argument("--calibration-samples", type=int, default=500)
+parser.add_argument("--parity-samples", type=int, default=2000)
+parser.add_argument(
+    "--min-agreement",
+    type=float,
+    default=0.995,
+    help="Share of parity samples where both models must predict the same digit",
+)
+args = parser.parse_args()
+
+models_dir = abspath(join("models"))
+keras_path = join(models_dir, f"{args.version}.keras")
+tflite_path = join(models_dir, f"{args.version}.tflite")
+
+(X_train, _), (X_test, y_test) = datasets.mnist.load_data()
+X_train = X_train.astype(np.float32) / 255.0
+X_test = X_test[: args.parity_samples].astype(np.float32) / 255.0
+y_test = y_test[: args.parity_samples]
+
+model = models.load_model(keras_path)
+
+converter = tf.lite.TFLiteConverter.from_keras_model(model)
+if args.quantize:
+    calibration = X_train[
+        np.random.default_rng(0).choice(len(X_train), args.calibration_samples)
+    ]
+
+    def representative_dataset():
+        for image in calibration:
+            yield [image.reshape(1, 28, 28, 1)]
+
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+flatbuffer = converter.convert()
+
+with open(f"{tflite_path}.tmp", "wb") as file:
+    file.write(flatbuffer)
+
+tflite_model = TFLiteModel(tf.lite.Interpreter(model_path=f"{tflite_path}.tmp"))
+keras_logits = np.asarray(model.predict(X_test, batch_size=256, verbose=0))
+tflite_logits = np.concatenate(
+    [tflite_model.predict(X_test[i : i + 256]) for i in range(0, len(X_test), 256)]
+)
+
+report = {
+    "version": args.version,
+    "quantized": args.quantize,
+    "size_bytes": len(flatbuffer),
+    "samples": len(X_test),
+    "agreement": float(
+        np.mean(keras_logits.argmax(axis=1) == tflite_logits.argmax(axis=1))
+    ),
+    "max_abs_logit_diff": float(np.abs(keras_logits - tflite_logits).max()),
+    "keras_accuracy": float(np.mean(keras_logits.argmax(axis=1) == y_test)),
+    "tflite_accuracy": float(np.mean(tflite_logits.argmax(axis=1) == y_test)),
+}
+logger.info(f"Parity report: {report}")
+
+if report["agreement"] < args.min_agreement:
+    logger.error(
+        f"TFLite model agrees on only {report['agreement']:.2%} of the samples, "
+        f"below {args.min_agreement:.2%}; not exporting it"
+    )
+    raise SystemExit(1)
+
+replace(f"{tflite_path}.tmp", tflite_path)
+with open(f"{tflite_path}.json", "w") as file:
+    json.dump(report, file, indent=2)
+
+logger.info(f"Exported {tflite_path}")
@@ -0,0 +1,96 @@
+from tensorflow.keras import datasets, models
+from os.path import join, abspath, exists
+from datetime import datetime, timezone
+from loguru import logger
+import numpy as np
+import argparse
+import json
+
+from config import DATASET_DIR
+from database import SessionLocal
+from image_store import image_store
+from modules.dataset import DigitDataset, append_feedback_digits
+from modules.models import finetune
+
+parser = argparse.ArgumentParser(
+    description="Fine-tune cnn_latest.keras on new feedback digits mixed with MNIST"
+)
+parser.add_argument("--epochs", type=int, default=3)
+parser.add_argument("--learning-rate", type=float, default=1e-4)
+parser.add_argument("--batch-size", type=int, default=32)
+parser.add_argument(
+    "--replay-ratio",
+    type=float,
+    default=4.0,
+    help="MNIST samples replayed per feedback digit, against forgetting",
+)
+parser.add_argument("--min-digits", type=int, default=1)
+parser.add_argument(
+    "--max-accuracy-drop",
+    type=float,
+    default=0.01,
+    help="Largest MNIST test accuracy loss accepted before discarding the new model",
+)
+args = parser.parse_args()
+
+models_dir = abspath(join("models"))
+dataset = DigitDataset(DATASET_DIR)
+# Rows packed into the dataset are marked was_used_for_training; this cursor
+# remembers how far the fine-tuning itself has gone through them.
+state_path = join(DATASET_DIR, "finetune_state.json")
+trained_until = 0
+if exists(state_path):
+    with open(state_path) as file:
+        trained_until = json.load(file)["trained_until"]
+
+db = SessionLocal()
+try:
+    append_feedback_digits(db, dataset, image_store.read)
+finally:
+    db.close()
+
+images, labels = dataset.load()
+X_new = np.asarray(images[trained_until:])
+y_new = np.asarray(labels[trained_until:])
+if len(X_new) < args.min_digits:
+    logger.info(f"Only {len(X_new)} new feedback digits, nothing to fine-tune")
+    raise SystemExit(0)
+
+(X_train, y_train), (X_test, y_test) = datasets.mnist.load_data()
+rng = np.random.default_rng()
+replay = rng.choice(len(X_train), size=int(len(X_new) * args.replay_ratio))
+X = np.concatenate([X_new, X_train[replay]]).astype(np.float32) / 255.0
+y = np.concatenate([y_new, y_train[replay]])
+shuffle = rng.permutation(len(X))
+
+model = models.load_model(join(models_dir, "cnn_latest.keras"))
+_, accuracy_before = model.evaluate(X_test / 255.0, y_test, verbose=0)
+
+finetuned_model, history = finetune(
+    model,
+    X[shuffle],
+    y[shuffle],
+    learning_rate=args.learning_rate,
+    epochs=args.epochs,
+    batch_size=args.batch_size,
+)
+_, accuracy_after = finetuned_model.evaluate(X_test / 255.0, y_test, verbose=0)
+logger.info(
+    f"Fine-tuned on {len(X_new)} feedback digits and {len(replay)} MNIST replays: "
+    f"MNIST test accuracy {accuracy_before:.4f} -> {accuracy_after:.4f}"
+)
+
+if accuracy_after < accuracy_before - args.max_accuracy_drop:
+    logger.error("Fine-tuned model lost too much accuracy, keeping the current one")
+    raise SystemExit(1)
+
+current_date_time = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+current_model_name = f"cnn_{current_date_time}.keras"
+
+finetuned_model.save(join(models_dir, "cnn_latest.keras"))
+finetuned_model.save(join(models_dir, current_model_name))
+
+with open(state_path, "w") as file:
+    json.dump({"trained_until": len(images), "model": current_model_name}, file)
+
+logger.info(f"Saved {current_model_name}")
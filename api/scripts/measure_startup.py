@@ -0,0 +1,62 @@
+from urllib.request import urlopen
+from urllib.error import URLError, HTTPError
+from loguru import logger
+import subprocess
+import argparse
+import json
+import time
+import sys
+
+parser = argparse.ArgumentParser(
+    description="Start the API with uvicorn and time its first responses"
+)
+parser.add_argument("--port", type=int, default=8765)
+parser.add_argument("--runs", type=int, default=3)
+parser.add_argument(
+    "--paths",
+    nargs="+",
+    default=["/health", "/ready"],
+    help="Routes timed until they first answer 200",
+)
+parser.add_argument("--timeout", type=float, default=120.0)
+args = parser.parse_args()
+
+
+def _status(url):
+    try:
+        with urlopen(url, timeout=1) as response:
+            return response.status
+    except HTTPError as err:
+        return err.code
+    except (URLError, ConnectionError, TimeoutError):
+        return None
+
+
+def measure():
+    timings = {}
+    started_at = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for path in args.paths:
+            url = f"http://127.0.0.1:{args.port}{path}"
+            while _status(url) != 200:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {server.returncode}")
+                if time.perf_counter() - started_at > args.timeout:
+                    raise TimeoutError(f"{path} did not answer 200 in {args.timeout}s")
+                time.sleep(0.02)
+            timings[path] = round(time.perf_counter() - started_at, 3)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+runs = [measure() for _ in range(args.runs)]
+summary = {path: min(run[path] for run in runs) for path in args.paths}
+logger.info(f"Time to first 200 (best of {args.runs}, seconds): {summary}")
+print(json.dumps({"runs": runs, "best": summary}, indent=2))
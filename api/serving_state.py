@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+from loguru import logger
+from sqlalchemy import select
+
+from database import SessionLocal
+from executors import run_io
+from models import ServingSetting
+
+
+def _read_settings():
+    db = SessionLocal()
+    try:
+        return dict(db.execute(select(ServingSetting.key, ServingSetting.value)).all())
+    finally:
+        db.close()
+
+
+def _write_setting(key, value):
+    db = SessionLocal()
+    try:
+        db.merge(ServingSetting(key=key, value=value))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class ServingState:
+    """Serving settings shared by every worker through the database
+
+    Admin routes apply a change to their own worker, then `save` it. Every
+    worker polls the settings every `poll_interval_s` and hands the ones
+    that changed to the handler registered for their key, so all gunicorn
+    workers end up serving the same models. Changes and polls take `lock`
+    in turn, so a poll never re-applies a value being replaced.
+    """
+
+    def __init__(self, poll_interval_s=2.0):
+        self.poll_interval = max(0.1, float(poll_interval_s))
+        self.lock = asyncio.Lock()
+        self._handlers = {}
+        self._applied = {}
+        self._poller = None
+
+    def on(self, key, handler):
+        """Registering the coroutine function applying a setting's value"""
+        self._handlers[key] = handler
+
+    async def save(self, key, value):
+        """Storing a setting this worker has already applied"""
+        value = json.dumps(value, sort_keys=True)
+        await run_io(_write_setting, key, value)
+        self._applied[key] = value
+
+    async def sync(self):
+        """Applying the settings changed since the last sync"""
+        async with self.lock:
+            settings = await run_io(_read_settings)
+            for key, value in settings.items():
+                handler = self._handlers.get(key)
+                if handler is None or self._applied.get(key) == value:
+                    continue
+                # Marked applied even on failure, rather than retried every poll
+                self._applied[key] = value
+                try:
+                    await handler(json.loads(value))
+                except Exception as err:
+                    logger.error(f"Failed to apply the {key} serving setting: {err}")
+
+    async def start(self):
+        """Applying the stored settings, then polling them"""
+        if self._poller is not None:
+            return
+        try:
+            await self.sync()
+        except Exception as err:
+            logger.error(f"Failed to read the serving settings: {err}")
+        self._poller = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._poller is None:
+            return
+        self._poller.cancel()
+        try:
+            await self._poller
+        except asyncio.CancelledError:
+            pass
+        self._poller = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.sync()
+            except Exception as err:
+                logger.error(f"Failed to read the serving settings: {err}")
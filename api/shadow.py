@@ -0,0 +1,75 @@
+import asyncio
+
+from loguru import logger
+
+from executors import run_io
+from metrics import SHADOW_SCORES
+from modules.registry import top_predictions
+from persistence import write_shadow_scores
+
+
+class ShadowScorer:
+    """Scoring served predictions on the shadow model in the background
+
+    `submit` returns right away. The shadow model runs through its own
+    batch predictor, whose rows are (output, model version, inference ms),
+    so it never holds up the requests it scores; its label, confidence and
+    latency are then written next to the served ones, in memory for rows
+    still queued by the write-behind queue and with one UPDATE otherwise.
+    At most `max_pending` submissions are scored at once, further ones are
+    dropped rather than queued behind a slow model.
+    """
+
+    def __init__(self, predictor, router, write_behind, max_pending=256):
+        self.predictor = predictor
+        self.router = router
+        self.write_behind = write_behind
+        self.max_pending = max(0, int(max_pending))
+        self._tasks = set()
+
+    def submit(self, uuids, X, served_version):
+        """Scheduling the shadow scoring of digits served by another version"""
+        version = self.router.routing.shadow
+        if version is None or version == served_version:
+            return
+        if len(self._tasks) >= self.max_pending:
+            SHADOW_SCORES.labels(model_version=version, result="dropped").inc(
+                len(uuids)
+            )
+            return
+        task = asyncio.create_task(self._score(version, uuids, X))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        """Waiting for the scorings still running"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _score(self, version, uuids, X):
+        try:
+            if len(X) == 1:
+                rows = [await self.predictor.predict(X[0], version)]
+            else:
+                rows = await self.predictor.predict_batch(X, version)
+
+            committed = []
+            for uuid, (output, model_version, inference_ms) in zip(uuids, rows):
+                label, confidence = top_predictions(output)
+                fields = {
+                    "shadow_model_version": model_version,
+                    "shadow_predicted_label": int(label),
+                    "shadow_confidence": float(confidence),
+                    "shadow_inference_ms": inference_ms,
+                }
+                if await self.write_behind.update(uuid, **fields) is None:
+                    committed.append({"uuid": uuid, **fields})
+            if committed:
+                await run_io(write_shadow_scores, committed)
+        except Exception as err:
+            logger.error(
+                f"Shadow scoring on {version} failed for {len(uuids)} digits: {err}"
+            )
+            SHADOW_SCORES.labels(model_version=version, result="failed").inc(len(uuids))
+            return
+        SHADOW_SCORES.labels(model_version=version, result="scored").inc(len(uuids))
@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from models import (
+    DigitShadowStatsHourly,
+    DigitStats,
+    DigitStatsHourly,
+    ModelEnsemble,
+)
+
+DIGITS = 10
+
+
+def _accuracy(correct, with_feedback):
+    return correct / with_feedback if with_feedback else 0.0
+
+
+def _since(hours):
+    # Start of the oldest of the last `hours` hourly buckets
+    return datetime.now(timezone.utc).replace(
+        tzinfo=None, minute=0, second=0, microsecond=0
+    ) - timedelta(hours=hours - 1)
+
+
+async def read_stats(db, hours=24):
+    """Reading prediction statistics from the aggregate tables
+
+    Their size does not depend on the number of digits, so neither does
+    the cost of this call. `confusion_matrix[true][predicted]` counts the
+    digits with feedback, `hourly` covers the last `hours` hours, the
+    current one included.
+    """
+    confusion_matrix = [[0] * DIGITS for _ in range(DIGITS)]
+    versions = {}
+    for row in await db.scalars(select(DigitStats)):
+        version = versions.setdefault(
+            row.model_version or "unknown",
+            {"total_predictions": 0, "with_feedback": 0, "correct": 0},
+        )
+        version["total_predictions"] += row.count
+        if row.true_label < 0:
+            continue
+        version["with_feedback"] += row.count
+        if row.true_label == row.predicted_label:
+            version["correct"] += row.count
+        if 0 <= row.true_label < DIGITS and 0 <= row.predicted_label < DIGITS:
+            confusion_matrix[row.true_label][row.predicted_label] += row.count
+
+    for version in versions.values():
+        version["accuracy"] = _accuracy(version["correct"], version["with_feedback"])
+
+    since = _since(hours)
+    hourly = await db.scalars(
+        select(DigitStatsHourly)
+        .where(DigitStatsHourly.bucket >= since)
+        .order_by(DigitStatsHourly.bucket, DigitStatsHourly.model_version)
+    )
+
+    total_predictions = sum(v["total_predictions"] for v in versions.values())
+    with_feedback = sum(v["with_feedback"] for v in versions.values())
+    correct = sum(v["correct"] for v in versions.values())
+    return {
+        "total_predictions": total_predictions,
+        "with_feedback": with_feedback,
+        "correct": correct,
+        "accuracy": _accuracy(correct, with_feedback),
+        "confusion_matrix": confusion_matrix,
+        "by_model_version": versions,
+        "hourly": [
+            {
+                "bucket": row.bucket.isoformat(),
+                "model_version": row.model_version or "unknown",
+                "predictions": row.predictions,
+                "feedbacks": row.feedbacks,
+                "correct": row.correct,
+            }
+            for row in hourly
+        ],
+    }
+
+
+def _mean(total, count):
+    return total / count if count else None
+
+
+async def read_model_evidence(db, hours=24):
+    """Comparing models on the digits predicted in the last `hours` hours,
+    the current one included, from the aggregate tables
+
+    `served` covers the digits each version answered: their mean forward
+    pass and their accuracy on feedback. `shadow` covers the digits each
+    version scored in the background, with its accuracy next to the one of
+    the models that answered those same digits, a like-for-like comparison.
+    Ensemble versions list the `members` they average.
+    """
+    since = _since(hours)
+    versions = {}
+
+    served = await db.execute(
+        select(
+            DigitStatsHourly.model_version,
+            func.sum(DigitStatsHourly.predictions),
+            func.sum(DigitStatsHourly.inference_ms_sum),
+            func.sum(DigitStatsHourly.inference_count),
+            func.sum(DigitStatsHourly.feedbacks),
+            func.sum(DigitStatsHourly.correct),
+        )
+        .where(DigitStatsHourly.bucket >= since)
+        .group_by(DigitStatsHourly.model_version)
+    )
+    for model_version, predictions, inference_ms, timed, feedbacks, correct in served:
+        # Buckets whose digits were all deleted stay behind at zero
+        if not predictions:
+            continue
+        versions.setdefault(model_version or "unknown", {})["served"] = {
+            "predictions": predictions,
+            "mean_inference_ms": _mean(inference_ms, timed),
+            "with_feedback": feedbacks,
+            "accuracy": _accuracy(correct, feedbacks),
+        }
+
+    shadow = await db.execute(
+        select(
+            DigitShadowStatsHourly.model_version,
+            func.sum(DigitShadowStatsHourly.predictions),
+            func.sum(DigitShadowStatsHourly.inference_ms_sum),
+            func.sum(DigitShadowStatsHourly.inference_count),
+            func.sum(DigitShadowStatsHourly.feedbacks),
+            func.sum(DigitShadowStatsHourly.correct),
+            func.sum(DigitShadowStatsHourly.served_correct),
+        )
+        .where(DigitShadowStatsHourly.bucket >= since)
+        .group_by(DigitShadowStatsHourly.model_version)
+    )
+    for (
+        model_version,
+        scored,
+        inference_ms,
+        timed,
+        feedbacks,
+        correct,
+        served_correct,
+    ) in shadow:
+        if not scored:
+            continue
+        versions.setdefault(model_version, {})["shadow"] = {
+            "predictions": scored,
+            "mean_inference_ms": _mean(inference_ms, timed),
+            "with_feedback": feedbacks,
+            "accuracy": _accuracy(correct, feedbacks),
+            "served_accuracy": _accuracy(served_correct, feedbacks),
+        }
+
+    ensembles = await db.execute(
+        select(ModelEnsemble.version, ModelEnsemble.members).where(
+            ModelEnsemble.version.in_(list(versions))
+        )
+    )
+    for model_version, members in ensembles:
+        versions[model_version]["members"] = members.split(",")
+
+    return {"hours": hours, "by_model_version": versions}
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from modules.backends import get_backend
+
+tf = pytest.importorskip("tensorflow")
+
+
+def test_tflite_backend_matches_keras(tmp_path):
+    from modules.models import create_cnn_model
+
+    model = create_cnn_model()
+    keras_path = str(tmp_path / "cnn_test.keras")
+    model.save(keras_path)
+    flatbuffer = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+    (tmp_path / "cnn_test.tflite").write_bytes(flatbuffer)
+
+    keras_backend, tflite_backend = get_backend("keras"), get_backend("tflite")
+    X = np.random.default_rng(0).random((5, 28, 28), dtype=np.float32)
+
+    expected = keras_backend.predict(keras_backend.load(keras_path), X)
+    tflite_model = tflite_backend.load(keras_path)
+
+    assert np.allclose(tflite_backend.predict(tflite_model, X), expected, atol=1e-4)
+    assert tflite_backend.predict(tflite_model, X[:2]).shape == (2, 10)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_backend("onnx")
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from modules.batching import BatchPredictor
+
+
+def test_concurrent_predictions_share_one_forward_pass():
+    calls = []
+
+    def predict_fn(X):
+        calls.append(len(X))
+        return X.reshape(len(X), -1).sum(axis=1, keepdims=True)
+
+    async def scenario():
+        predictor = BatchPredictor(predict_fn, max_batch_size=8, max_wait_ms=50)
+        await predictor.start()
+        try:
+            samples = [np.full((28, 28), i, dtype=np.float32) for i in range(5)]
+            return await asyncio.gather(*(predictor.predict(x) for x in samples))
+        finally:
+            await predictor.stop()
+
+    outputs = asyncio.run(scenario())
+
+    assert calls == [5]
+    assert [float(output[0]) for output in outputs] == [i * 28 * 28 for i in range(5)]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    calls = []
+
+    def predict_fn(X):
+        calls.append(len(X))
+        return np.zeros((len(X), 10))
+
+    async def scenario():
+        predictor = BatchPredictor(predict_fn, max_batch_size=4, max_wait_ms=50)
+        await predictor.start()
+        try:
+            samples = [np.zeros((28, 28)) for _ in range(10)]
+            await asyncio.gather(*(predictor.predict(x) for x in samples))
+        finally:
+            await predictor.stop()
+
+    asyncio.run(scenario())
+
+    assert sum(calls) == 10
+    assert max(calls) <= 4
+
+
+def test_prediction_errors_reach_every_caller():
+    def predict_fn(X):
+        raise ValueError("boom")
+
+    async def scenario():
+        predictor = BatchPredictor(predict_fn, max_batch_size=4, max_wait_ms=10)
+        await predictor.start()
+        try:
+            return await asyncio.gather(
+                *(predictor.predict(np.zeros((28, 28))) for _ in range(3)),
+                return_exceptions=True,
+            )
+        finally:
+            await predictor.stop()
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_samples_are_grouped_by_model_key():
+    calls = []
+
+    def predict_fn(X, key=None):
+        calls.append((key, len(X)))
+        return np.full((len(X), 1), key or "active")
+
+    async def scenario():
+        predictor = BatchPredictor(predict_fn, max_batch_size=8, max_wait_ms=50)
+        await predictor.start()
+        try:
+            keys = [None, "cnn_b", None, "cnn_b", None]
+            return await asyncio.gather(
+                *(predictor.predict(np.zeros((28, 28)), key) for key in keys)
+            )
+        finally:
+            await predictor.stop()
+
+    outputs = asyncio.run(scenario())
+
+    assert calls == [(None, 3), ("cnn_b", 2)]
+    assert [output[0] for output in outputs] == [
+        "active",
+        "cnn_b",
+        "active",
+        "cnn_b",
+        "active",
+    ]
+
+
+def test_stop_fails_the_batch_being_run():
+    release = threading.Event()
+
+    def predict_fn(X):
+        release.wait(5)
+        return np.zeros((len(X), 10))
+
+    async def scenario():
+        predictor = BatchPredictor(predict_fn, max_batch_size=4, max_wait_ms=1)
+        await predictor.start()
+        pending = asyncio.gather(
+            *(predictor.predict(np.zeros((28, 28))) for _ in range(2)),
+            return_exceptions=True,
+        )
+        await asyncio.sleep(0.05)
+        await predictor.stop()
+        release.set()
+        return await asyncio.wait_for(pending, 1)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_drain_waits_for_the_samples_of_a_key():
+    release = threading.Event()
+
+    def predict_fn(X, key=None):
+        release.wait(5)
+        return np.zeros((len(X), 10))
+
+    async def scenario():
+        predictor = BatchPredictor(predict_fn, max_batch_size=4, max_wait_ms=1)
+        await predictor.start()
+        try:
+            pending = asyncio.create_task(
+                predictor.predict(np.zeros((28, 28)), "cnn_b")
+            )
+            await predictor.drain(lambda key: key == "cnn_a")
+            drained = asyncio.create_task(predictor.drain(lambda key: key == "cnn_b"))
+            await asyncio.sleep(0.05)
+            waited = not drained.done()
+            release.set()
+            await asyncio.wait_for(drained, 1)
+            await pending
+            return waited
+        finally:
+            await predictor.stop()
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,134 @@
+"""Micro-benchmarks of each stage of the /predict hot path
+
+Skipped unless RUN_BENCHMARKS is set. Save a baseline, then compare
+against it after a change:
+
+    RUN_BENCHMARKS=1 pytest tests/test_benchmarks.py --benchmark-autosave
+    RUN_BENCHMARKS=1 pytest tests/test_benchmarks.py --benchmark-compare \
+        --benchmark-compare-fail=median:10%
+"""
+
+from itertools import count
+from os import getenv
+from PIL import Image
+import numpy as np
+import base64
+import io
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, configure_engine, database_urls, engine_options
+from image_store import ImageStore
+from models import Digit
+from modules.backends import get_backend
+from modules.cache import image_digest
+from modules.preprocessing import _open_image, decode_raw, normalize, prepare_digits
+from persistence import new_digit_row
+from scripts.drawings import canvases
+
+pytestmark = pytest.mark.skipif(
+    not getenv("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run benchmarks"
+)
+
+BATCH_SIZES = [1, 8, 32, 128, 512, 1024]
+
+
+@pytest.fixture(scope="module")
+def canvas():
+    return canvases(1)[0]
+
+
+@pytest.fixture(scope="module")
+def png_base64(canvas):
+    buffer = io.BytesIO()
+    Image.fromarray(canvas).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture(scope="module")
+def digits():
+    return prepare_digits(canvases(max(BATCH_SIZES)))
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    from modules.models import create_cnn_model
+
+    path = str(tmp_path_factory.mktemp("models") / "cnn_bench.keras")
+    create_cnn_model().save(path)
+    return path
+
+
+def test_base64_decode(benchmark, png_base64):
+    benchmark(base64.b64decode, png_base64)
+
+
+def test_pil_open_and_convert(benchmark, png_base64):
+    benchmark(_open_image, png_base64)
+
+
+def test_prepare_one_canvas(benchmark, canvas):
+    benchmark(prepare_digits, canvas[np.newaxis])
+
+
+def test_decode_raw_canvas(benchmark, canvas):
+    benchmark(decode_raw, canvas.tobytes(), 4)
+
+
+def test_image_digest(benchmark, digits):
+    benchmark(image_digest, digits[0])
+
+
+@pytest.mark.parametrize("batch_size", [1, 1024])
+def test_normalize(benchmark, digits, batch_size):
+    benchmark(normalize, digits[:batch_size])
+
+
+@pytest.mark.parametrize("batch_size", BATCH_SIZES)
+@pytest.mark.parametrize("backend_name", ["keras", "numpy"])
+def test_predict(benchmark, model_path, digits, backend_name, batch_size):
+    backend = get_backend(backend_name)
+    model = backend.load(model_path)
+    X = normalize(digits[:batch_size])
+    backend.predict(model, X)
+    benchmark(backend.predict, model, X)
+
+
+@pytest.mark.parametrize("packed", [False, True], ids=["loose", "packed"])
+def test_png_store(benchmark, tmp_path, digits, packed):
+    store = ImageStore(str(tmp_path), packed=packed)
+    versions = count()
+
+    def fresh_image():
+        # The store deduplicates, so every round writes a distinct image
+        image = digits[0].copy()
+        image.flat[:8] = np.frombuffer(next(versions).to_bytes(8, "little"), np.uint8)
+        return (image,), {}
+
+    benchmark.pedantic(store.put, setup=fresh_image, rounds=200)
+
+
+@pytest.mark.parametrize("rows", [1, 64])
+def test_digit_insert_and_commit(benchmark, tmp_path, rows):
+    url, _ = database_urls(f"sqlite:///{tmp_path / 'app.db'}")
+    engine = configure_engine(create_engine(url, **engine_options(url)))
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    uuids = count()
+
+    def fresh_rows():
+        batch = [
+            new_digit_row(str(next(uuids)), 3, 0.9, "cnn_bench") | {"img_path": "x"}
+            for _ in range(rows)
+        ]
+        return (batch,), {}
+
+    def insert_and_commit(batch):
+        db.execute(insert(Digit), batch)
+        db.commit()
+
+    benchmark.pedantic(insert_and_commit, setup=fresh_rows, rounds=200)
+    db.close()
+    engine.dispose()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from modules.cache import PredictionCache, image_digest
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put(b"a", "v1", 1)
+    cache.put(b"b", "v1", 2)
+    assert cache.get(b"a", "v1") == 1
+
+    cache.put(b"c", "v1", 3)
+
+    assert cache.get(b"b", "v1") is None
+    assert cache.get(b"a", "v1") == 1
+    assert len(cache) == 2
+
+
+def test_entries_expire_and_follow_the_model_version():
+    now = [0.0]
+    cache = PredictionCache(ttl_seconds=10, clock=lambda: now[0])
+    cache.put(b"a", "v1", 1)
+    cache.put(b"b", "v1", 2)
+
+    now[0] = 11.0
+    assert cache.get(b"a", "v1") is None
+
+    cache.put(b"a", "v1", 1)
+    assert cache.get(b"a", "v2") is None
+    assert len(cache) == 0
+
+
+def test_image_digest_depends_on_pixels_and_shape():
+    img = np.zeros((28, 28), dtype=np.uint8)
+    other = img.copy()
+    other[0, 0] = 1
+
+    assert image_digest(img) == image_digest(img.copy())
+    assert image_digest(img) != image_digest(other)
+    assert image_digest(img) != image_digest(img.reshape(14, 56))
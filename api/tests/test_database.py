@@ -0,0 +1,43 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import configure_engine, database_urls, engine_options, pool_limits
+
+
+def test_urls_and_pool_options_follow_the_backend():
+    sync_url, async_url = database_urls("postgresql://app:secret@db:5432/digits")
+    assert sync_url.drivername == async_url.drivername == "postgresql+psycopg"
+    assert "pool_size" in engine_options(sync_url)
+
+    sync_url, async_url = database_urls("sqlite:///./data/app.db")
+    assert (sync_url.drivername, async_url.drivername) == ("sqlite", "sqlite+aiosqlite")
+    assert "pool_size" not in engine_options(sync_url)
+
+
+def test_pools_fit_the_connection_budget_of_all_workers():
+    # Two engines in each of 4 workers share 80 connections: 10 per engine
+    assert pool_limits(80, 4, 8, 4) == (8, 2)
+    assert pool_limits(80, 16, 8, 4) == (2, 0)
+    assert pool_limits(80, 0, 8, 4) == (8, 4)
+    assert pool_limits(0, 16, 8, 4) == (8, 4)
+
+
+def test_sqlite_connections_use_wal_and_pragmas(tmp_path):
+    sync_url, async_url = database_urls(f"sqlite:///{tmp_path / 'app.db'}")
+    engine = configure_engine(create_engine(sync_url, **engine_options(sync_url)))
+
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+    async def busy_timeout():
+        async_engine = create_async_engine(async_url)
+        configure_engine(async_engine.sync_engine)
+        async with async_engine.connect() as connection:
+            value = (await connection.execute(text("PRAGMA busy_timeout"))).scalar()
+        await async_engine.dispose()
+        return value
+
+    assert asyncio.run(busy_timeout()) == 5000
@@ -0,0 +1,69 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Digit
+from modules.dataset import DigitDataset, append_feedback_digits
+
+
+def test_append_is_incremental_and_memory_mapped(tmp_path):
+    dataset = DigitDataset(str(tmp_path))
+
+    assert dataset.append(np.ones((3, 28, 28)), [1, 2, 3]) == (0, 3)
+    assert dataset.append(np.full((2, 28, 28), 7), [4, 5]) == (3, 5)
+
+    images, labels = dataset.load()
+    assert isinstance(images, np.memmap)
+    assert images.shape == (5, 28, 28)
+    assert labels.tolist() == [1, 2, 3, 4, 5]
+    assert np.load(dataset.images_path).shape == (5, 28, 28)
+
+
+def test_empty_append_keeps_the_existing_rows(tmp_path):
+    dataset = DigitDataset(str(tmp_path))
+    dataset.append(np.ones((3, 28, 28)), [1, 2, 3])
+
+    assert dataset.append(np.empty((0, 28, 28)), []) == (3, 3)
+
+    images, labels = dataset.load()
+    assert images.shape == (3, 28, 28)
+    assert labels.tolist() == [1, 2, 3]
+
+
+def test_feedback_rows_are_packed_once(tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        [
+            Digit(
+                uuid="a",
+                img_path="a",
+                predicted_label=1,
+                confidence=0.5,
+                true_label=7,
+                has_feedback=True,
+            ),
+            Digit(uuid="b", img_path="b", predicted_label=2, confidence=0.5),
+            Digit(
+                uuid="c",
+                img_path="c",
+                predicted_label=3,
+                confidence=0.5,
+                true_label=3,
+                has_feedback=True,
+            ),
+        ]
+    )
+    db.commit()
+    images = {"a": np.full((28, 28), 1), "c": np.full((28, 28), 3)}
+    dataset = DigitDataset(str(tmp_path))
+
+    assert append_feedback_digits(db, dataset, images.get) == (0, 2)
+    assert append_feedback_digits(db, dataset, images.get) == (2, 2)
+
+    _, labels = dataset.load()
+    assert sorted(labels.tolist()) == [3, 7]
+    used = {digit.uuid for digit in db.query(Digit).filter(Digit.was_used_for_training)}
+    assert used == {"a", "c"}
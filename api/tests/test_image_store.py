@@ -0,0 +1,61 @@
+from os import listdir
+from os.path import join
+
+import numpy as np
+from PIL import Image
+
+from image_store import ImageStore
+
+
+def _digit(value):
+    img_array = np.zeros((28, 28), dtype=np.uint8)
+    img_array[10:18, 10:18] = value
+    return img_array
+
+
+def test_loose_store_shards_and_deduplicates(tmp_path):
+    store = ImageStore(str(tmp_path))
+
+    ref = store.put(_digit(255))
+
+    assert store.put(_digit(255)) == ref
+    assert store.put(_digit(128)) != ref
+    assert ref.count("/") == 2
+    assert np.array_equal(store.read(ref), _digit(255))
+
+
+def test_packed_store_appends_to_segments(tmp_path):
+    store = ImageStore(str(tmp_path), packed=True, segment_size=200)
+
+    refs = [store.put(_digit(value)) for value in (50, 100, 150, 200)]
+
+    assert store.put(_digit(100)) == refs[1]
+    assert len(set(refs)) == 4
+    assert len([name for name in listdir(tmp_path / "segments") if name.endswith(".seg")]) > 1
+    for value, ref in zip((50, 100, 150, 200), refs):
+        assert np.array_equal(store.read(ref), _digit(value))
+
+    reopened = ImageStore(str(tmp_path), packed=True, segment_size=200)
+    assert reopened.put(_digit(150)) == refs[2]
+
+
+def test_legacy_paths_still_resolve(tmp_path):
+    legacy_path = join(str(tmp_path), "image_20250710_131912.png")
+    Image.fromarray(_digit(255)).save(legacy_path)
+
+    store = ImageStore(str(tmp_path / "store"))
+
+    assert np.array_equal(store.read(legacy_path), _digit(255))
+
+
+def test_packed_stores_of_several_processes_share_segments(tmp_path):
+    first = ImageStore(str(tmp_path), packed=True)
+    second = ImageStore(str(tmp_path), packed=True)
+
+    ref = first.put(_digit(50))
+    other_ref = second.put(_digit(100))
+
+    assert second.put(_digit(50)) == ref
+    assert other_ref != ref
+    assert np.array_equal(first.read(other_ref), _digit(100))
+    assert np.array_equal(second.read(ref), _digit(50))
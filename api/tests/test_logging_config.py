@@ -0,0 +1,49 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from loguru import logger
+
+import logging_config
+from logging_config import RequestLogMiddleware, _json_format, annotate
+
+
+def test_one_sampled_json_line_per_request(monkeypatch):
+    monkeypatch.setattr(
+        logging_config, "SAMPLE_RATES", {"/quiet": 0.0001, "/probe": 0.0}
+    )
+    app = FastAPI()
+    app.add_middleware(RequestLogMiddleware)
+
+    @app.get("/loud")
+    async def loud():
+        annotate(predicted_digit=7)
+        return {}
+
+    @app.get("/probe")
+    async def probe():
+        return 1 / 0
+
+    @app.get("/quiet")
+    async def quiet(fail: bool = False):
+        return {} if not fail else 1 / 0
+
+    lines = []
+    sink = logger.add(lines.append, format=_json_format, level="INFO")
+    try:
+        client = TestClient(app, raise_server_exceptions=False)
+        client.get("/loud")
+        client.get("/quiet")
+        client.get("/probe")
+        client.get("/quiet", params={"fail": True})
+    finally:
+        logger.remove(sink)
+
+    records = [json.loads(line) for line in lines if '"method"' in line]
+    assert [(record["path"], record["status"]) for record in records] == [
+        ("/loud", 200),
+        ("/quiet", 500),
+    ]
+    assert records[0]["predicted_digit"] == 7
+    assert records[0]["message"] == "GET /loud 200"
+    assert records[1]["level"] == "ERROR"
@@ -0,0 +1,26 @@
+from prometheus_client import REGISTRY
+
+from metrics import record_feedback, record_predictions, stage_timer
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_predictions_feedback_and_stages_are_recorded():
+    sevens = {"model_version": "cnn_test", "digit": "7"}
+    before = sample("digit_predictions_total", **sevens)
+    record_predictions([7, 7, 1], [0.9, 0.4, 0.8], "cnn_test")
+    assert sample("digit_predictions_total", **sevens) == before + 2
+    low = {"model_version": "cnn_test", "le": "0.5"}
+    assert sample("digit_prediction_confidence_bucket", **low) >= 1
+
+    record_feedback("cnn_test", 7, 7)
+    record_feedback(None, 7, 1)
+    assert sample("digit_feedback_total", model_version="cnn_test", result="correct")
+    assert sample("digit_feedback_total", model_version="unknown", result="incorrect")
+
+    before = sample("digit_stage_duration_seconds_count", stage="decode")
+    with stage_timer("decode"):
+        pass
+    assert sample("digit_stage_duration_seconds_count", stage="decode") == before + 1
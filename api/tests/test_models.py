@@ -0,0 +1,30 @@
+from sqlalchemy import Column, MetaData, Table, create_engine, insert, select, text
+
+from models import TRAINING_QUEUE, Digit, UuidKey
+
+
+def test_binary_uuid_keys_round_trip_as_strings():
+    engine = create_engine("sqlite://")
+    table = Table("keys", MetaData(), Column("uuid", UuidKey(binary=True)))
+    table.create(engine)
+    key = "6f1c3a52-8e0b-4d7e-9a1f-2b3c4d5e6f70"
+
+    with engine.begin() as connection:
+        connection.execute(insert(table).values(uuid=key))
+        stored = connection.execute(text("SELECT uuid FROM keys")).scalar()
+        loaded = connection.execute(select(table.c.uuid).where(table.c.uuid == key))
+
+        assert isinstance(stored, bytes) and len(stored) == 16
+        assert loaded.scalar() == key
+
+
+def test_training_queue_scan_uses_its_partial_index():
+    engine = create_engine("sqlite://")
+    Digit.metadata.create_all(engine)
+    query = select(Digit.uuid).where(TRAINING_QUEUE).order_by(Digit.created_at)
+    statement = query.compile(engine, compile_kwargs={"literal_binds": True})
+
+    with engine.connect() as connection:
+        plan = connection.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+
+    assert any("ix_digits_training_queue" in row[-1] for row in plan)
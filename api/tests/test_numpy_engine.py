@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from modules.numpy_engine import NumpyModel, _max_pooling2d, map_weights
+
+
+def test_numpy_engine_matches_keras(tmp_path):
+    pytest.importorskip("tensorflow")
+    from modules.backends import get_backend
+    from modules.models import create_cnn_model
+
+    keras_path = str(tmp_path / "cnn_test.keras")
+    create_cnn_model().save(keras_path)
+
+    keras_backend, numpy_backend = get_backend("keras"), get_backend("numpy")
+    X = np.random.default_rng(0).random((5, 28, 28), dtype=np.float32)
+
+    expected = keras_backend.predict(keras_backend.load(keras_path), X)
+    numpy_model = numpy_backend.load(keras_path)
+
+    assert np.allclose(numpy_backend.predict(numpy_model, X), expected, atol=1e-4)
+    assert numpy_backend.predict(numpy_model, X[:1]).shape == (1, 10)
+
+
+def test_max_pooling_handles_overlapping_windows():
+    X = np.random.default_rng(0).random((2, 7, 6, 3), dtype=np.float32)
+
+    pooled = _max_pooling2d(X, (3, 2), (2, 1))
+
+    expected = np.empty((2, 3, 5, 3), dtype=np.float32)
+    for i in range(3):
+        for j in range(5):
+            expected[:, i, j] = X[:, 2 * i : 2 * i + 3, j : j + 2].max(axis=(1, 2))
+    assert np.array_equal(pooled, expected)
+
+
+def test_mapped_weights_are_shared_read_only_and_refreshed(tmp_path):
+    rng = np.random.default_rng(0)
+
+    def model():
+        return NumpyModel(
+            [
+                ("Flatten", {}),
+                (
+                    "Dense",
+                    {
+                        "kernel": rng.random((784, 10), dtype=np.float32),
+                        "bias": rng.random(10, dtype=np.float32),
+                        "activation": "linear",
+                    },
+                ),
+            ],
+            (28, 28, 1),
+        )
+
+    X = rng.random((3, 28, 28), dtype=np.float32)
+    path = str(tmp_path / "cnn_test.weights.npy")
+    original = model()
+    expected = original.predict(X)
+
+    mapped = map_weights(original, path)
+    kernel = mapped.layers[1][1]["kernel"]
+    assert isinstance(kernel.base, np.memmap) and not kernel.flags.writeable
+    assert np.allclose(mapped.predict(X), expected)
+
+    retrained = model()
+    expected = retrained.predict(X)
+    assert np.allclose(map_weights(retrained, path).predict(X), expected)
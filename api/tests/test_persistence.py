@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import numpy as np
+
+import persistence
+from persistence import WriteBehindQueue, new_digit_row
+
+
+def _row(uuid):
+    return new_digit_row(uuid=uuid, predicted_label=3, confidence=0.9)
+
+
+def test_rows_are_flushed_in_batches_and_drained_on_stop(monkeypatch):
+    written = []
+    monkeypatch.setattr(
+        persistence, "_write_batch", lambda rows, img_arrays: written.append(rows)
+    )
+
+    async def scenario():
+        queue = WriteBehindQueue(batch_size=2, flush_interval_ms=10_000)
+        await queue.start()
+        for i in range(5):
+            await queue.submit(_row(str(i)), np.zeros((28, 28), dtype=np.uint8))
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    assert [len(rows) for rows in written] == [2, 2, 1]
+    assert [row["uuid"] for rows in written for row in rows] == list("01234")
+
+
+def test_feedback_is_applied_to_a_queued_row(monkeypatch):
+    written = []
+    monkeypatch.setattr(
+        persistence, "_write_batch", lambda rows, img_arrays: written.extend(rows)
+    )
+
+    async def scenario():
+        queue = WriteBehindQueue(batch_size=10, flush_interval_ms=10_000)
+        await queue.start()
+        await queue.submit(_row("abc"), np.zeros((28, 28), dtype=np.uint8))
+        updated = await queue.update("abc", true_label=7, has_feedback=True)
+        missing = await queue.update("unknown", true_label=1, has_feedback=True)
+        await queue.stop()
+        return updated, missing
+
+    updated, missing = asyncio.run(scenario())
+
+    assert updated["true_label"] == 7
+    assert missing is None
+    assert written[0]["true_label"] == 7
+    assert written[0]["has_feedback"] is True
+
+
+def test_rows_failing_every_retry_are_dead_lettered(monkeypatch, tmp_path):
+    written = []
+
+    def write_batch(rows, img_arrays):
+        if any(row["uuid"] == "bad" for row in rows):
+            raise ValueError("constraint failed")
+        written.extend(rows)
+
+    monkeypatch.setattr(persistence, "_write_batch", write_batch)
+    dead_letter_path = tmp_path / "dead_letter.jsonl"
+
+    async def scenario():
+        queue = WriteBehindQueue(
+            batch_size=10,
+            flush_interval_ms=10_000,
+            max_retries=2,
+            dead_letter_path=str(dead_letter_path),
+        )
+        await queue.start()
+        for uuid in ("good", "bad"):
+            await queue.submit(_row(uuid), np.zeros((28, 28), dtype=np.uint8))
+        await queue.flush()
+        assert len(queue._pending) == 2
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert [row["uuid"] for row in written] == ["good"]
+    assert not queue._pending
+    assert '"uuid": "bad"' in dead_letter_path.read_text()
+
+
+def test_stop_lets_a_flush_in_progress_requeue_its_failed_batch(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls, written = [], []
+
+    def write_batch(rows, img_arrays):
+        calls.append(rows)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            raise ValueError("database is locked")
+        written.extend(rows)
+
+    monkeypatch.setattr(persistence, "_write_batch", write_batch)
+
+    async def scenario():
+        queue = WriteBehindQueue(batch_size=2, flush_interval_ms=10_000)
+        await queue.start()
+        for uuid in ("a", "b"):
+            await queue.submit(_row(uuid), np.zeros((28, 28), dtype=np.uint8))
+        await asyncio.to_thread(started.wait, 5)
+        stopping = asyncio.create_task(queue.stop())
+        await asyncio.sleep(0.01)
+        release.set()
+        await stopping
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert [row["uuid"] for row in written] == ["a", "b"]
+    assert not queue._pending
@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+
+import pytest
+
+from modules.preprocessing import (
+    decode_raw,
+    load_npy,
+    prepare_digits,
+    to_grayscale,
+)
+
+
+def test_to_grayscale_composites_alpha_against_the_ink():
+    X = np.zeros((2, 4, 4, 4), dtype=np.uint8)
+    X[0, ..., :3] = 30
+    X[1, ..., :3] = 255
+    X[:, :2, :, 3] = 255
+
+    gray = to_grayscale(X)
+
+    # Dark strokes over white, light strokes over black
+    assert np.allclose(gray[0, :2], 30, atol=0.5)
+    assert np.allclose(gray[0, 2:], 255)
+    assert np.allclose(gray[1, :2], 255, atol=0.5)
+    assert np.allclose(gray[1, 2:], 0)
+
+
+def test_white_ink_on_transparent_canvas_is_not_blank():
+    canvas = np.zeros((1, 192, 192, 4), dtype=np.uint8)
+    canvas[:, 40:150, 80:110] = 255
+
+    X = prepare_digits(canvas)
+
+    assert X.max() == 255
+
+
+def test_load_npy_accepts_rgba_canvas_batches():
+    canvas = np.full((3, 192, 192, 4), 255, dtype=np.uint8)
+    buffer = io.BytesIO()
+    np.save(buffer, canvas)
+
+    X = load_npy(buffer.getvalue())
+
+    assert X.shape == (3, 28, 28)
+    assert (X == 0).all()
+
+
+def test_decode_raw_keeps_mnist_style_digits_in_place():
+    digit = np.zeros((28, 28), dtype=np.uint8)
+    digit[4:24, 12:16] = 255
+
+    decoded = decode_raw(digit.tobytes())
+
+    assert np.array_equal(decoded, digit)
+
+
+def test_prepare_digits_inverts_fits_and_centers_drawings():
+    canvas = np.full((2, 192, 192, 4), 255, dtype=np.uint8)
+    canvas[0, 10:60, 20:120, :3] = 0
+    canvas[1, ..., 3] = 0
+
+    X = prepare_digits(canvas)
+
+    assert X.shape == (2, 28, 28)
+    ink = np.argwhere(X[0] > 127)
+    assert ink[:, 1].max() - ink[:, 1].min() + 1 == 20
+    rows, cols = np.indices((28, 28)) + 0.5
+    mass = X[0].sum()
+    assert abs((X[0] * rows).sum() / mass - 14) < 0.1
+    assert abs((X[0] * cols).sum() / mass - 14) < 0.1
+    assert (X[1] == 0).all()
+
+
+def test_decode_raw_rejects_non_square_buffers():
+    with pytest.raises(ValueError):
+        decode_raw(b"\x00" * 100, channels=4)
+    with pytest.raises(ValueError, match="channels, got 0"):
+        decode_raw(b"\x00" * 784, channels=0)
@@ -0,0 +1,44 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import profiling
+from executors import run_cpu
+from metrics import stage_timer
+from profiling import ProfilingMiddleware
+
+
+def busy():
+    with stage_timer("preprocess"):
+        time.sleep(0.05)
+
+
+def test_profiled_requests_get_spans_and_a_folded_profile(monkeypatch, tmp_path):
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/work")
+    async def work():
+        await run_cpu(busy)
+        return {}
+
+    client = TestClient(app)
+    assert "server-timing" not in client.get("/work").headers
+    assert (
+        "server-timing" not in client.get("/work", headers={"X-Profile": "1"}).headers
+    )
+
+    response = client.get("/work", headers={"X-Profile": "secret"})
+    timings = dict(
+        entry.split(";dur=") for entry in response.headers["server-timing"].split(", ")
+    )
+    assert float(timings["preprocess"]) >= 50
+    assert float(timings["total"]) >= float(timings["preprocess"])
+
+    (profile,) = tmp_path.glob("*_GET_work.folded")
+    assert "busy (test_profiling.py" in profile.read_text()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from modules.registry import ModelRegistry, ensemble_version, top_predictions
+
+
+def _registry(tmp_path, *versions):
+    for version in versions:
+        (tmp_path / f"{version}.keras").write_bytes(b"")
+    warmed_up = []
+
+    def predict_fn(model, X):
+        warmed_up.append(model)
+        return np.full((len(X), 10), model)
+
+    registry = ModelRegistry(
+        str(tmp_path), lambda path: path.split("/")[-1], predict_fn
+    )
+    return registry, warmed_up
+
+
+def test_versions_are_listed_oldest_first_with_latest_last(tmp_path):
+    registry, _ = _registry(
+        tmp_path, "cnn_latest", "cnn_20250712090000", "cnn_2025-07-08T15:28:38Z"
+    )
+
+    versions = [item["version"] for item in registry.versions()]
+
+    assert versions == ["cnn_2025-07-08T15:28:38Z", "cnn_20250712090000", "cnn_latest"]
+
+
+def test_activation_warms_up_and_rollback_restores_previous_version(tmp_path):
+    registry, warmed_up = _registry(tmp_path, "cnn_a", "cnn_b")
+
+    registry.activate("cnn_a")
+    registry.activate("cnn_b")
+
+    assert warmed_up == ["cnn_a.keras", "cnn_b.keras"]
+    outputs, version = registry.predict(np.zeros((2, 28, 28)))
+    assert version == "cnn_b"
+    assert outputs.shape == (2, 10)
+
+    assert registry.rollback() == "cnn_a"
+    assert registry.active_version == "cnn_a"
+    with pytest.raises(LookupError):
+        registry.rollback()
+
+
+def test_failed_activation_keeps_the_active_model(tmp_path):
+    registry, _ = _registry(tmp_path, "cnn_a")
+    registry.activate("cnn_a")
+
+    with pytest.raises(FileNotFoundError):
+        registry.activate("cnn_missing")
+
+    assert registry.active_version == "cnn_a"
+
+
+def test_retained_versions_serve_challenger_and_ensemble_traffic(tmp_path):
+    registry, warmed_up = _registry(tmp_path, "cnn_a", "cnn_b", "cnn_c")
+    registry.activate("cnn_a")
+    X = np.zeros((2, 28, 28))
+
+    with pytest.raises(LookupError):
+        registry.predict(X, "cnn_b")
+
+    registry.retain(["cnn_a", "cnn_b"])
+    # The active model is reused rather than loaded twice
+    assert warmed_up == ["cnn_a.keras", "cnn_b.keras"]
+    outputs, version = registry.predict(X, "cnn_b")
+    assert version == "cnn_b"
+    assert outputs[0, 0] == "cnn_b.keras"
+
+    registry.predict_fn = lambda model, X: np.full((len(X), 10), len(model))
+    outputs, version = registry.predict_ensemble(X, ("cnn_a", "cnn_b"))
+    assert version == ensemble_version(("cnn_b", "cnn_a"))
+    assert outputs.shape == (2, 10)
+
+    registry.retain(["cnn_c"])
+    with pytest.raises(LookupError):
+        registry.predict(X, "cnn_b")
+
+
+def test_top_predictions_turn_logits_into_probabilities():
+    logits = np.array([[2.0, 8.0, -3.0], [0.0, 0.0, 0.0]], dtype=np.float32)
+
+    labels, confidences = top_predictions(logits)
+
+    assert labels.tolist() == [1, 0]
+    assert confidences[0] == pytest.approx(1 / (1 + np.exp(-6) + np.exp(-11)))
+    assert confidences[1] == pytest.approx(1 / 3)
+    label, confidence = top_predictions(logits[0])
+    assert (int(label), float(confidence)) == (1, pytest.approx(confidences[0]))
@@ -1,3 +1,5 @@
+import uuid as uuid_lib
+
 from fastapi.testclient import TestClient
 
 from main import app
@@ -15,3 +17,118 @@ def test_health_route():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_ready_route_waits_for_the_model(monkeypatch):
+    from routes import registry
+    from modules.registry import ActiveModel
+
+    monkeypatch.setattr(registry, "active", None)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert client.post("/predict", json={"image": ""}).status_code == 503
+
+    monkeypatch.setattr(registry, "active", ActiveModel("cnn_test", object()))
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "model_version": "cnn_test"}
+
+
+def test_feedback_updates_known_digits_and_rejects_unknown_ones(tmp_path):
+    from sqlalchemy import create_engine, insert, select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from database import Base, database_urls, get_async_db
+    from models import Digit
+    from persistence import new_digit_row
+    import routes
+
+    sync_url, async_url = database_urls(f"sqlite:///{tmp_path / 'app.db'}")
+    engine = create_engine(sync_url)
+    Base.metadata.create_all(engine)
+    uuids = [str(uuid_lib.uuid4()) for _ in range(3)]
+    unknown = str(uuid_lib.uuid4())
+    rows = [new_digit_row(uuid, 1, 0.9) for uuid in uuids]
+    with engine.begin() as connection:
+        connection.execute(insert(Digit), [row | {"img_path": "x"} for row in rows])
+
+    sessions = async_sessionmaker(
+        create_async_engine(async_url, poolclass=NullPool), expire_on_commit=False
+    )
+
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_test_db
+    try:
+        feedback = {"digit_uuid": uuids[0], "true_digit": 7, "is_correct": False}
+        response = client.post("/feedback", json=feedback)
+        assert response.status_code == 200
+        assert response.json()["true_label"] == 7
+        committed_keys = set(response.json())
+        assert "img_path" not in committed_keys
+
+        # A digit still queued for writing answers in the same shape
+        queued = new_digit_row(str(uuid_lib.uuid4()), 4, 0.8)
+        routes.write_behind._pending[queued["uuid"]] = (queued, None)
+        try:
+            response = client.post(
+                "/feedback", json=feedback | {"digit_uuid": queued["uuid"]}
+            )
+        finally:
+            routes.write_behind._pending.pop(queued["uuid"])
+        assert response.status_code == 200
+        assert set(response.json()) == committed_keys
+        assert response.json()["true_label"] == 7
+
+        response = client.post("/feedback", json=feedback | {"digit_uuid": unknown})
+        assert response.status_code == 404
+
+        response = client.post("/feedback", json=feedback | {"digit_uuid": "nope"})
+        assert response.status_code == 422
+
+        feedbacks = [
+            {"digit_uuid": uuid, "true_digit": 3, "is_correct": False}
+            for uuid in (uuids[1], uuids[2].upper(), unknown)
+        ]
+        response = client.post("/feedback/batch", json={"feedbacks": feedbacks})
+        assert response.json() == {"updated": 2, "unknown": [unknown]}
+    finally:
+        app.dependency_overrides.clear()
+
+    with engine.connect() as connection:
+        labels = connection.execute(
+            select(Digit.uuid, Digit.true_label).where(Digit.has_feedback.is_(True))
+        )
+        assert dict(labels.all()) == {uuids[0]: 7, uuids[1]: 3, uuids[2]: 3}
+
+
+def test_admin_routes_require_a_configured_token(monkeypatch):
+    import routes
+
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", None)
+    assert client.get("/admin/models").status_code == 403
+
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr("auth.ADMIN_TOKEN", "secret")
+    assert client.get("/admin/models").status_code == 403
+    headers = {"X-Admin-Token": "wrong"}
+    assert client.get("/admin/models", headers=headers).status_code == 403
+    headers = {"X-Admin-Token": "secret"}
+    assert client.get("/admin/models", headers=headers).status_code == 200
+
+
+def test_predict_bodies_are_documented():
+    paths = client.get("/openapi.json").json()["paths"]
+
+    predict = paths["/predict"]["post"]
+    assert set(predict["requestBody"]["content"]) == {
+        "application/json",
+        "application/octet-stream",
+    }
+    assert predict["parameters"][0]["name"] == "X-Image-Channels"
+
+    batch = paths["/predict/batch"]["post"]["requestBody"]["content"]
+    assert set(batch) == {"application/json", "multipart/form-data"}
+    assert "images" in batch["application/json"]["schema"]["properties"]
@@ -0,0 +1,33 @@
+from itertools import cycle
+
+import pytest
+
+from modules.routing import TrafficRouter, parse_routing, routing_versions
+
+
+def test_routing_is_parsed_from_settings():
+    routing = parse_routing("cnn_b", "25", "", "cnn_a, cnn_c,cnn_a")
+
+    assert routing.challenger == "cnn_b"
+    assert routing.challenger_percent == 25.0
+    assert routing.shadow is None
+    assert routing.ensemble == ("cnn_a", "cnn_c")
+    assert routing_versions(routing) == ["cnn_b", "cnn_a", "cnn_c"]
+
+    with pytest.raises(ValueError):
+        parse_routing("cnn_b", 120)
+    with pytest.raises(ValueError):
+        parse_routing(ensemble=["cnn_a"])
+
+
+def test_challenger_gets_its_share_of_traffic_and_the_ensemble_the_rest():
+    draws = cycle(index / 10 for index in range(10))
+    router = TrafficRouter(
+        parse_routing("cnn_b", 30, ensemble="cnn_a,cnn_c"), rng=lambda: next(draws)
+    )
+
+    keys = [router.choose() for _ in range(10)]
+
+    assert keys.count("cnn_b") == 3
+    assert keys.count(("cnn_a", "cnn_c")) == 7
+    assert TrafficRouter().choose() is None
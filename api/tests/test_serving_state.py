@@ -0,0 +1,33 @@
+import asyncio
+
+import serving_state
+from serving_state import ServingState
+
+
+def test_settings_saved_by_one_worker_are_applied_by_the_others(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(serving_state, "_read_settings", lambda: dict(stored))
+    monkeypatch.setattr(
+        serving_state, "_write_setting", lambda key, value: stored.update({key: value})
+    )
+
+    async def scenario():
+        admin, other = ServingState(), ServingState()
+        applied = {"admin": [], "other": []}
+        admin.on("active_model", lambda value: _append(applied["admin"], value))
+        other.on("active_model", lambda value: _append(applied["other"], value))
+
+        await admin.save("active_model", {"version": "cnn_b"})
+        await admin.sync()
+        await other.sync()
+        await other.sync()
+        return applied
+
+    applied = asyncio.run(scenario())
+
+    # The saving worker has applied its change already, the others once
+    assert applied == {"admin": [], "other": [{"version": "cnn_b"}]}
+
+
+async def _append(values, value):
+    values.append(value)
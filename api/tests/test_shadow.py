@@ -0,0 +1,59 @@
+import asyncio
+
+import numpy as np
+
+import shadow
+from modules.batching import BatchPredictor
+from modules.routing import TrafficRouter, parse_routing
+from persistence import WriteBehindQueue, new_digit_row
+from shadow import ShadowScorer
+
+
+def _predict_rows(X, key=None):
+    outputs = np.zeros((len(X), 10))
+    outputs[:, 7] = 0.8
+    return [(output, key, 1.5) for output in outputs]
+
+
+def test_shadow_scores_reach_queued_and_committed_rows(monkeypatch):
+    updated = []
+    monkeypatch.setattr(shadow, "write_shadow_scores", updated.extend)
+
+    async def scenario():
+        queue = WriteBehindQueue(batch_size=10, flush_interval_ms=10_000)
+        await queue.start()
+        row = new_digit_row(uuid="queued", predicted_label=3, confidence=0.9)
+        await queue.submit(row, np.zeros((28, 28), dtype=np.uint8))
+
+        scorer = ShadowScorer(
+            BatchPredictor(_predict_rows),
+            TrafficRouter(parse_routing(shadow="cnn_b")),
+            queue,
+        )
+        X = np.zeros((2, 28, 28), dtype=np.uint8)
+        scorer.submit(["queued", "committed"], X, "cnn_a")
+        # Never scored by the model that served the digit
+        scorer.submit(["served"], X[:1], "cnn_b")
+        await scorer.stop()
+        return row
+
+    row = asyncio.run(scenario())
+
+    assert row["shadow_model_version"] == "cnn_b"
+    assert row["shadow_predicted_label"] == 7
+    assert row["shadow_inference_ms"] == 1.5
+    assert [item["uuid"] for item in updated] == ["committed"]
+
+
+def test_submissions_past_max_pending_are_dropped():
+    async def scenario():
+        scorer = ShadowScorer(
+            BatchPredictor(_predict_rows),
+            TrafficRouter(parse_routing(shadow="cnn_b")),
+            WriteBehindQueue(),
+            max_pending=0,
+        )
+        scorer.submit(["dropped"], np.zeros((1, 28, 28)), "cnn_a")
+        return len(scorer._tasks)
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,191 @@
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+import asyncio
+import random
+import uuid as uuid_lib
+
+import pytest
+from sqlalchemy import create_engine, delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from database import Base, database_urls
+from models import Digit, ModelEnsemble, stats_backfill_statements
+from persistence import new_digit_row, update_digits
+from stats import read_model_evidence, read_stats
+
+
+def test_aggregates_follow_predictions_feedback_and_deletes(tmp_path):
+    sync_url, async_url = database_urls(f"sqlite:///{tmp_path / 'app.db'}")
+    engine = create_engine(sync_url)
+    Base.metadata.create_all(engine)
+    rows = [
+        new_digit_row(f"digit-{index}", label, 0.9, model_version) | {"img_path": "x"}
+        for index, (label, model_version) in enumerate(
+            [(1, "cnn_a"), (1, "cnn_a"), (7, "cnn_a"), (3, "cnn_b")]
+        )
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Digit), rows)
+        feedback = update(Digit).values(has_feedback=True)
+        connection.execute(feedback.where(Digit.uuid == "digit-0").values(true_label=1))
+        connection.execute(feedback.where(Digit.uuid == "digit-2").values(true_label=2))
+        # A relabelled digit only counts with its last label
+        connection.execute(feedback.where(Digit.uuid == "digit-2").values(true_label=7))
+        connection.execute(feedback.where(Digit.uuid == "digit-3").values(true_label=8))
+        connection.execute(delete(Digit).where(Digit.uuid == "digit-1"))
+
+    async def read():
+        async_engine = create_async_engine(async_url)
+        async with AsyncSession(async_engine) as db:
+            stats = await read_stats(db, hours=1)
+        await async_engine.dispose()
+        return stats
+
+    stats = asyncio.run(read())
+
+    assert stats["total_predictions"] == 3
+    assert stats["with_feedback"] == 3
+    assert stats["accuracy"] == 2 / 3
+    assert stats["confusion_matrix"][7][7] == 1
+    assert stats["confusion_matrix"][8][3] == 1
+    assert sum(map(sum, stats["confusion_matrix"])) == 3
+    assert stats["by_model_version"]["cnn_a"]["accuracy"] == 1.0
+    assert [
+        (hour["model_version"], hour["predictions"]) for hour in stats["hourly"]
+    ] == [
+        ("cnn_a", 2),
+        ("cnn_b", 1),
+    ]
+
+
+def test_evidence_compares_served_and_shadow_versions(tmp_path):
+    sync_url, async_url = database_urls(f"sqlite:///{tmp_path / 'app.db'}")
+    engine = create_engine(sync_url)
+    Base.metadata.create_all(engine)
+    shadow = {"shadow_model_version": "cnn_b", "shadow_inference_ms": 4.0}
+    rows = [
+        new_digit_row("digit-0", 1, 0.9, "ensemble_ab", 2.0) | shadow,
+        new_digit_row("digit-1", 7, 0.9, "ensemble_ab", 4.0),
+        new_digit_row("digit-2", 3, 0.9, "cnn_a"),
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Digit), [row | {"img_path": "x"} for row in rows])
+        # Shadow scores landing after the digit was committed
+        connection.execute(
+            update(Digit)
+            .where(Digit.uuid == "digit-1")
+            .values(shadow_predicted_label=7, **shadow)
+        )
+        connection.execute(
+            update(Digit)
+            .where(Digit.uuid.in_(["digit-0", "digit-1"]))
+            .values(has_feedback=True, true_label=7)
+        )
+        connection.execute(
+            insert(ModelEnsemble),
+            [{"version": "ensemble_ab", "members": "cnn_a,cnn_c"}],
+        )
+
+    async def read():
+        async_engine = create_async_engine(async_url)
+        async with AsyncSession(async_engine) as db:
+            evidence = await read_model_evidence(db, hours=1)
+        await async_engine.dispose()
+        return evidence
+
+    versions = asyncio.run(read())["by_model_version"]
+
+    assert versions["ensemble_ab"]["members"] == ["cnn_a", "cnn_c"]
+    assert versions["ensemble_ab"]["served"]["predictions"] == 2
+    assert versions["ensemble_ab"]["served"]["mean_inference_ms"] == 3.0
+    assert versions["ensemble_ab"]["served"]["accuracy"] == 0.5
+    assert versions["cnn_a"]["served"]["mean_inference_ms"] is None
+    assert versions["cnn_b"]["shadow"] == {
+        "predictions": 2,
+        "mean_inference_ms": 4.0,
+        "with_feedback": 2,
+        "accuracy": 0.5,
+        "served_accuracy": 0.5,
+    }
+
+
+STATS_TABLES = ("digit_stats", "digit_stats_hourly", "digit_shadow_stats_hourly")
+
+
+@pytest.mark.skipif(
+    not getenv("TEST_POSTGRES_URL"),
+    reason="set TEST_POSTGRES_URL to a PostgreSQL database to run",
+)
+def test_postgres_aggregates_survive_concurrent_inserts_and_feedback():
+    # In a schema of its own, dropped afterwards
+    schema = f"test_{uuid_lib.uuid4().hex}"
+    sync_url, _ = database_urls(getenv("TEST_POSTGRES_URL"))
+    admin = create_engine(sync_url)
+    with admin.begin() as connection:
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(
+        sync_url, connect_args={"options": f"-csearch_path={schema}"}, pool_size=8
+    )
+    try:
+        Base.metadata.create_all(engine)
+
+        def write(seed):
+            # A write-behind batch, then feedback on half of it, while the
+            # other workers write theirs to the same aggregate rows
+            generator = random.Random(seed)
+            rows = [
+                new_digit_row(
+                    str(uuid_lib.uuid4()),
+                    generator.randrange(10),
+                    0.9,
+                    generator.choice(["cnn_a", "cnn_b", "cnn_c"]),
+                    generator.choice([None, 2.0]),
+                )
+                | {
+                    "img_path": "x",
+                    "shadow_model_version": generator.choice([None, "cnn_d"]),
+                }
+                for _ in range(64)
+            ]
+            with engine.begin() as connection:
+                connection.execute(insert(Digit), rows)
+            feedback = [
+                {
+                    "uuid": row["uuid"],
+                    "true_label": generator.randrange(10),
+                    "has_feedback": True,
+                }
+                for row in rows[::2]
+            ]
+            with engine.begin() as connection:
+                connection.execute(update_digits(feedback))
+
+        with ThreadPoolExecutor(8) as executor:
+            # Raises on a deadlock
+            list(executor.map(write, range(64)))
+
+        def aggregates():
+            with engine.connect() as connection:
+                return {
+                    table: sorted(
+                        tuple(row)
+                        for row in connection.execute(text(f"SELECT * FROM {table}"))
+                        if any(row[2 if table != "digit_stats" else 3 :])
+                    )
+                    for table in STATS_TABLES
+                }
+
+        maintained = aggregates()
+        with engine.begin() as connection:
+            for table in STATS_TABLES:
+                connection.execute(text(f"DELETE FROM {table}"))
+            for statement in stats_backfill_statements("postgresql"):
+                connection.exec_driver_sql(statement)
+            total = connection.scalar(select(func.count()).select_from(Digit))
+        assert total == 64 * 64
+        assert maintained == aggregates()
+    finally:
+        engine.dispose()
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
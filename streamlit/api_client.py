@@ -2,6 +2,8 @@ from os import getenv
 from dotenv import load_dotenv
 import requests
 from loguru import logger
+from PIL import Image
+import numpy as np
 import streamlit as st
 
 load_dotenv()
@@ -9,11 +11,62 @@ load_dotenv()
 API_URL = getenv("API_URL")
 
 
+DIGIT_DIMENSION = 28
+
+
+def to_gray_canvas(img_array: np.ndarray) -> np.ndarray:
+    """Flattening an RGBA/RGB/gray canvas to uint8 grayscale, compositing the
+    alpha channel over white under dark strokes and over black under light
+    ones"""
+    img = img_array.astype(np.float32)
+    if img.ndim == 2:
+        return img_array.astype(np.uint8)
+
+    gray = img[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    if img.shape[-1] == 4:
+        alpha = img[..., 3] / 255.0
+        ink = (gray * alpha).sum() / max(alpha.sum(), 1e-6)
+        background = 0.0 if ink > 127.5 else 255.0
+        gray = gray * alpha + background * (1 - alpha)
+
+    return np.clip(np.rint(gray), 0, 255).astype(np.uint8)
+
+
+def to_digit(img_array: np.ndarray) -> np.ndarray:
+    """Cropping a canvas to the square around its strokes and area-averaging
+    it down to 28x28, so /predict receives 784 bytes; the API then fits and
+    centers the digit like MNIST"""
+    gray = to_gray_canvas(img_array)
+    background = 255 if np.median(gray) > 127.5 else 0
+    rows, cols = np.nonzero(np.abs(gray.astype(np.int16) - background) > 25)
+    if len(rows):
+        side = max(np.ptp(rows), np.ptp(cols)) + 1
+        center_y = (rows.min() + rows.max()) // 2
+        center_x = (cols.min() + cols.max()) // 2
+        # A quarter of margin, so the strokes keep clear of the crop's edges
+        side = max(DIGIT_DIMENSION, side + side // 4)
+        padded = np.pad(gray, side, constant_values=background)
+        top, left = center_y + side - side // 2, center_x + side - side // 2
+        gray = padded[top : top + side, left : left + side]
+
+    digit = Image.fromarray(gray).resize(
+        (DIGIT_DIMENSION, DIGIT_DIMENSION), Image.Resampling.BOX
+    )
+    return np.asarray(digit, dtype=np.uint8)
+
+
 def predict(image):
+    """Sending a base64 PNG as JSON, or a canvas array as a raw 28x28 grayscale buffer"""
+    if isinstance(image, np.ndarray):
+        payload = {
+            "data": to_digit(image).tobytes(),
+            "headers": {"Content-Type": "application/octet-stream"},
+        }
+    else:
+        payload = {"json": {"image": image}}
+
     try:
-        response = requests.post(
-            url=f"{API_URL}/predict", json={"image": image}, timeout=300
-        )
+        response = requests.post(url=f"{API_URL}/predict", timeout=300, **payload)
         response.raise_for_status()
 
         return response.json()
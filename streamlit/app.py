@@ -1,10 +1,7 @@
 import streamlit as st
 from streamlit_drawable_canvas import st_canvas
 from loguru import logger
-from PIL import Image
 import numpy as np
-import base64
-import io
 
 from api_client import predict, feedback
 
@@ -24,16 +21,6 @@ DRAWING_MODES = ("freedraw", "point", "line", "rect", "circle", "transform")
 CANVAS_DIMENSION = 192
 
 
-def image_to_base64(img_array: np.ndarray) -> str:
-    img_pil = Image.fromarray(img_array)
-
-    buffer = io.BytesIO()
-    img_pil.save(buffer, format="PNG")
-    img_base64 = base64.b64encode(buffer.getvalue()).decode()
-
-    return img_base64
-
-
 def main():
     # Initialisation du state
     if "current_prediction" not in st.session_state:
@@ -75,10 +62,9 @@ def main():
 
     if predict_button and has_image_data and not is_empty:
         img_array = canvas_result.image_data.astype(np.uint8)
-        img_base64 = image_to_base64(img_array=img_array)
 
         with st.spinner("Predicting..."):
-            prediction_result = predict(img_base64)
+            prediction_result = predict(img_array)
 
             if prediction_result:
                 st.session_state.current_prediction = prediction_result